@@ -1,15 +1,15 @@
 from ultk.language.semantics import Referent
 
 
-def _and(a: bool, b: bool) -> bool:
+def _and(a: bool, b: bool, commutative: bool = True, idempotent: bool = True) -> bool:
     return a and b
 
 
-def _or(a: bool, b: bool) -> bool:
+def _or(a: bool, b: bool, commutative: bool = True, idempotent: bool = True) -> bool:
     return a or b
 
 
-def _not(a: bool) -> bool:
+def _not(a: bool, involutive: bool = True) -> bool:
     return not a
 
 
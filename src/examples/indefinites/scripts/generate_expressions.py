@@ -7,11 +7,14 @@ from ..meaning import universe as indefinites_universe
 
 if __name__ == "__main__":
     expressions_by_meaning: dict[Meaning, GrammaticalExpression] = (
+        # best-first enumeration generates expressions in order of length, so no depth limit is needed:
+        # it stops as soon as an expression has been found for every possible meaning
         indefinites_grammar.get_unique_expressions(
-            5,
+            None,
             max_size=2 ** len(indefinites_universe),
             unique_key=lambda expr: expr.evaluate(indefinites_universe),
             compare_func=lambda e1, e2: len(e1) < len(e2),
+            best_first=True,
         )
     )
 
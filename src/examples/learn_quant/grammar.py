@@ -1,4 +1,4 @@
-from ultk.language.grammar import Grammar, Rule
+from ultk.language.grammar import Grammar, Rule, compile_func
 from typing import Iterable
 
 
@@ -38,7 +38,8 @@ class QuantifierGrammar(Grammar):
                 name="{}".format(index),
                 lhs="int",
                 rhs=None,
-                func=lambda _: index,
+                # compiled from source rather than a closure, so that the grammar can be pickled
+                func=compile_func(f"lambda _: {index}"),
                 weight=weight,
             )
         )
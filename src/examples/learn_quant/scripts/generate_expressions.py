@@ -33,6 +33,7 @@ def enumerate_quantifiers(
             max_size=2 ** len(quantifiers_universe),
             unique_key=lambda expr: expr.evaluate(quantifiers_universe),
             compare_func=lambda e1, e2: len(e1) < len(e2),
+            best_first=True,
         )
     )
 
@@ -1,4 +1,5 @@
 from typing import Callable
+from ultk.language.grammar import register_type
 from ultk.language.semantics import Referent
 
 
@@ -6,11 +7,13 @@ global start
 start = "bool"
 
 
+@register_type
 class FrozensetA(frozenset):
     def __new__(cls, *args):
         return super().__new__(cls, *args)
 
 
+@register_type
 class FrozensetB(frozenset):
     def __new__(cls, *args):
         return super().__new__(cls, *args)
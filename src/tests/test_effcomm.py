@@ -0,0 +1,312 @@
+import itertools
+from math import factorial
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from ultk.effcomm.agent import (
+    LiteralListener,
+    LiteralSpeaker,
+    PragmaticListener,
+    PragmaticSpeaker,
+)
+from ultk.effcomm.optimization import EvolutionaryOptimizer
+from ultk.effcomm.rsa import rsa, rsa_informativity
+from ultk.effcomm.signaling import roth_erev, signaling_game, to_agents
+from ultk.effcomm.informativity import (
+    IncrementalInformativity,
+    VectorizedUtility,
+    batch_informativity,
+    batch_informativity_from_matrix,
+    build_utility_matrix,
+    communicative_success,
+    indicator_utility,
+    informativity,
+    meaning_matrix,
+    stack_meanings,
+)
+from ultk.effcomm.sampling import (
+    coverage_sample,
+    get_hypothetical_variants_batch,
+    permutation_rank,
+    permutation_unrank,
+    random_permutations,
+)
+from ultk.language.language import Expression, Language
+from ultk.language.sampling import all_languages
+from ultk.language.semantics import Meaning, Referent, Universe
+from ultk.util.frozendict import FrozenDict
+
+referents = tuple(Referent(str(num), {"num": num}) for num in range(4))
+universe = Universe(referents)
+
+
+def expression(form: str, nums: set[int]) -> Expression:
+    return Expression(
+        form,
+        Meaning(FrozenDict({ref: ref.num in nums for ref in referents}), universe),
+    )
+
+
+class TestEffcomm:
+    language = Language(
+        (
+            expression("small", {0, 1}),
+            expression("zero", {0}),
+            expression("odd", {1, 3}),
+            expression("big", {2, 3}),
+        )
+    )
+
+    def test_permutation_ranks(self):
+        permutations = list(itertools.permutations(range(4)))
+        assert [permutation_rank(p) for p in permutations] == list(range(24))
+        assert [permutation_unrank(rank, 4) for rank in range(24)] == permutations
+        # beyond 64-bit ranks
+        big = tuple(reversed(range(25)))
+        assert permutation_rank(big) == factorial(25) - 1
+        assert permutation_unrank(factorial(25) - 1, 25) == big
+        with pytest.raises(ValueError):
+            permutation_unrank(24, 4)
+
+        sample = random_permutations(4, 24, np.random.default_rng(0))
+        assert sorted(map(tuple, sample)) == permutations
+
+    def test_hypothetical_variants_batch(self):
+        speaker = LiteralSpeaker(TestEffcomm.language)
+        weights = get_hypothetical_variants_batch(speaker, 10, np.random.default_rng(0))
+        assert weights.shape == (10,) + speaker.weights.shape
+        # every variant permutes the columns of the original weights
+        for variant in weights:
+            assert sorted(map(tuple, variant.T)) == sorted(
+                map(tuple, speaker.weights.T)
+            )
+        assert len({variant.tobytes() for variant in weights}) == 10
+
+        variants = get_hypothetical_variants_batch(
+            speaker, 10, np.random.default_rng(0), as_speakers=True
+        )
+        assert len(variants) == 10 and len(variants[2:5]) == 3
+        assert np.array_equal(variants[3].weights, weights[3])
+        assert variants[3].language is speaker.language
+        assert speaker.weights is not variants[3].weights
+
+    def test_coverage_sample(self):
+        expressions = sorted(TestEffcomm.language.expressions, key=str)
+        objectives = (
+            lambda languages: [len(language) for language in languages],
+            lambda languages: [
+                sum(sum(expr.meaning.mapping.values()) for expr in language.expressions)
+                for language in languages
+            ],
+        )
+        result = coverage_sample(
+            expressions, objectives, 50, 100, bins=3, rng=np.random.default_rng(0)
+        )
+        languages = result["languages"]
+        assert len(languages) == 15 == len(set(languages))
+        assert result["bin_counts"].sum() == 15
+        assert result["objectives"].shape == result["bins"].shape == (15, 2)
+        # importance weights correct for the adaptive choice of sizes
+        assert np.isclose(result["weights"].sum(), 1, atol=0.05)
+        mean_size = sum(len(language) for language in languages) / 15
+        estimate = sum(
+            weight * len(language)
+            for weight, language in zip(result["weights"], languages)
+        )
+        assert np.isclose(estimate, mean_size, atol=0.1)
+
+    def test_batch_informativity(self):
+        languages = list(all_languages(TestEffcomm.language.expressions))
+        prior = np.array([0.1, 0.2, 0.3, 0.4])
+        distance = lambda ref1, ref2: 1 / (1 + abs(ref1.num - ref2.num))
+        for agent_type in ("literal", "pragmatic"):
+            for utility in (None, distance):
+                kwargs = {"agent_type": agent_type}
+                if utility is not None:
+                    kwargs["utility"] = utility
+                expected = [
+                    informativity(language, prior, **kwargs) for language in languages
+                ]
+                assert np.allclose(
+                    batch_informativity(languages, prior, chunk_size=4, **kwargs),
+                    expected,
+                )
+
+        # the same, from a matrix of meanings
+        meanings = np.array([[1, 1, 0, 0], [1, 0, 0, 0], [0, 0, 1, 1]])
+        expected = [0.25, 0.5, 0.5]
+        assert np.allclose(
+            batch_informativity_from_matrix(
+                meanings, [[0], [0, 2], [1, 2]], np.full(4, 0.25)
+            ),
+            expected,
+        )
+
+    def test_utility_matrix(self):
+        assert np.array_equal(
+            build_utility_matrix(universe, indicator_utility), np.eye(4)
+        )
+
+        calls = []
+
+        def distance(ref1, ref2):
+            calls.append((ref1, ref2))
+            return 1 / (1 + abs(ref1.num - ref2.num))
+
+        matrix = build_utility_matrix(universe, distance)
+        assert len(calls) == 16
+        # cached, by value of the universe
+        assert build_utility_matrix(Universe(referents), distance) is matrix
+        assert len(calls) == 16
+        with pytest.raises(ValueError):
+            matrix[0, 0] = 0.0
+
+        vectorized = VectorizedUtility.from_property(
+            "num", lambda x, y: 1 / (1 + np.abs(x - y))
+        )
+        assert np.allclose(build_utility_matrix(universe, vectorized), matrix)
+        assert vectorized(referents[0], referents[2]) == distance(
+            referents[0], referents[2]
+        )
+
+    def test_incremental_informativity(self):
+        prior = np.array([0.1, 0.2, 0.3, 0.4])
+        distance = lambda ref1, ref2: 1 / (1 + abs(ref1.num - ref2.num))
+        expressions = sorted(TestEffcomm.language.expressions, key=str)
+        for utility in (indicator_utility, distance):
+            evaluator = IncrementalInformativity(universe, prior, utility)
+            languages = list(all_languages(expressions))
+            # every language from every other one
+            for language, changed in itertools.product(languages, repeat=2):
+                assert np.isclose(
+                    evaluator.update(language, changed),
+                    informativity(changed, prior, utility),
+                )
+
+        evaluator = IncrementalInformativity(universe, prior)
+        optimizer = EvolutionaryOptimizer(
+            [len, lambda language: 1 - evaluator(language)],
+            expressions,
+            sample_size=10,
+            max_mutations=2,
+            generations=3,
+            rng=np.random.default_rng(0),
+            incremental_informativity=evaluator,
+        )
+        result = optimizer.fit([Language(tuple(expressions[:1]))])
+        for language in result["explored_languages"]:
+            assert language in evaluator._languages
+            assert np.isclose(evaluator(language), informativity(language, prior))
+
+    def test_rsa(self):
+        languages = list(all_languages(TestEffcomm.language.expressions))
+        prior = np.array([0.1, 0.2, 0.3, 0.4])
+        meanings, language_indices = meaning_matrix(languages)
+        binary, mask = stack_meanings(meanings, language_indices)
+
+        result = rsa(binary, prior, depth=2, mask=mask)
+        for idx, language in enumerate(languages):
+            # the same as chaining agents
+            listener = LiteralListener(language)
+            for level in (1, 2):
+                speaker = PragmaticSpeaker(language, listener)
+                listener = PragmaticListener(language, speaker, np.diag(prior))
+            size = len(language)
+            assert np.allclose(np.exp(result["speakers"][2][idx][:, :size]), speaker.S)
+            assert np.allclose(np.exp(result["listeners"][2][idx][:size]), listener.R)
+            assert np.all(np.isneginf(result["speakers"][2][idx][:, size:]))
+
+        for depth, agent_type in ((0, "literal"), (1, "pragmatic")):
+            assert np.allclose(
+                rsa_informativity(binary, prior, depth=depth, mask=mask),
+                [
+                    informativity(language, prior, agent_type=agent_type)
+                    for language in languages
+                ],
+            )
+
+        # more rational speakers converge to a fixed point
+        result = rsa(binary, prior, depth=None, temperature=2.0, mask=mask)
+        assert result["converged"]
+
+    def test_sparse_agents(self):
+        prior = np.array([0.1, 0.2, 0.3, 0.4])
+        distance = lambda ref1, ref2: 1 / (1 + abs(ref1.num - ref2.num))
+        for language in all_languages(TestEffcomm.language.expressions):
+            speaker = LiteralSpeaker(language, sparse=True)
+            assert sparse.issparse(speaker.S)
+            assert np.allclose(
+                speaker.normalized_weights().toarray(),
+                LiteralSpeaker(language).normalized_weights(),
+            )
+            for agent_type in ("literal", "pragmatic"):
+                for utility in (indicator_utility, distance):
+                    assert np.isclose(
+                        informativity(
+                            language, prior, utility, agent_type, sparse=True
+                        ),
+                        informativity(language, prior, utility, agent_type),
+                    )
+
+    def test_to_language(self):
+        for language in all_languages(TestEffcomm.language.expressions):
+            for agent in (LiteralSpeaker(language), LiteralListener(language)):
+                # literal agents communicate exactly the meanings of the language
+                assert agent.to_language(threshold=0.0) == language
+            sparse_speaker = LiteralSpeaker(language, sparse=True)
+            assert sparse_speaker.to_language(threshold=0.0) == language
+
+        speaker = LiteralSpeaker(TestEffcomm.language, name="speaker")
+        learned = speaker.to_language(threshold=0.6)
+        assert learned.data["name"] == "speaker"
+        meanings = {
+            expression.form: {
+                ref.num for ref, value in expression.meaning.mapping.items() if value
+            }
+            for expression in learned.expressions
+        }
+        # only referent 2 has a single expression
+        assert meanings == {"small": set(), "zero": set(), "odd": set(), "big": {2}}
+
+    def test_signaling_game(self):
+        result = signaling_game(
+            TestEffcomm.language,
+            50,
+            3000,
+            record_every=500,
+            rng=np.random.default_rng(0),
+        )
+        assert result["senders"].shape == (50, 4, 4)
+        assert result["receivers"].shape == (50, 4, 4)
+        assert np.allclose(result["senders"].sum(axis=-1), 1)
+        assert list(result["rounds"]) == [500, 1000, 1500, 2000, 2500, 3000]
+        assert result["expected_success"].shape == (6, 50)
+        # learning beats chance and improves
+        assert result["expected_success"][0].mean() > 0.5
+        assert (
+            result["expected_success"][-1].mean() > result["expected_success"][0].mean()
+        )
+        assert np.isclose(
+            result["mean_reward"][-1].mean(),
+            result["expected_success"][-1].mean(),
+            atol=0.05,
+        )
+
+        speaker, listener = to_agents(TestEffcomm.language, result, game=3)
+        assert np.isclose(
+            communicative_success(speaker, listener, universe.prior_numpy, np.eye(4)),
+            result["expected_success"][-1][3],
+        )
+
+        # reproducible, and forgetting keeps propensities finite
+        for forgetting in (0.0, 0.2):
+            results = [
+                roth_erev(
+                    3, 3, 10, 2000, forgetting=forgetting, rng=np.random.default_rng(1)
+                )
+                for _ in range(2)
+            ]
+            assert np.array_equal(results[0]["senders"], results[1]["senders"])
+            assert np.all(np.isfinite(results[0]["senders"]))
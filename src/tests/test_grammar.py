@@ -1,4 +1,17 @@
-from ultk.language.grammar import Grammar, GrammaticalExpression, Rule
+import math
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from ultk.language.grammar import (
+    Grammar,
+    GrammaticalExpression,
+    InsideScore,
+    Rule,
+    register_type,
+    resolve_type,
+)
 from ultk.language.semantics import Meaning, Referent, Universe
 
 
@@ -53,3 +66,238 @@ class TestGrammar:
         print(enumed_grammar)
         for rule in enumed_grammar:
             print(rule)
+
+    def test_productive_depths(self):
+        grammar = Grammar(bool)
+        grammar.add_rule(Rule("not", bool, (bool,), lambda p: not p))
+        grammar.add_rule(Rule("even", bool, (int,), lambda n: n % 2 == 0))
+        grammar.add_rule(Rule("len", int, (str,), lambda s: len(s)))
+        grammar.add_rule(Rule("a", str, None, lambda *args: "a"))
+        # bool has no terminal rules, so it is only productive from depth 2 (via int)
+        assert not grammar.is_productive(bool, 0)
+        assert not grammar.is_productive(bool, 1)
+        assert grammar.is_productive(bool, 2)
+        assert grammar.is_productive(int, 1)
+        assert not grammar.is_productive(int, 2)
+        assert grammar.min_size(bool) == 3
+        assert grammar.min_size(float) == float("inf")
+        assert [str(expr) for expr in grammar.enumerate(depth=4)] == [
+            "even(len(a))",
+            "not(even(len(a)))",
+        ]
+
+    def test_lazy_type_registration(self, tmp_path):
+        register_type("fractions:Fraction", name="Frac")
+        grammar_file = tmp_path / "grammar.yml"
+        # types are only imported when a rule uses them, so an unimportable path is fine here
+        grammar_file.write_text(
+            "start: num\n"
+            "types:\n"
+            "  Missing: not_a_real_module:Missing\n"
+            "rules:\n"
+            "- lhs: num\n"
+            "  rhs:\n"
+            "  name: half\n"
+            "  func: 'lambda _: Frac(1, 2)'\n"
+        )
+        grammar = Grammar.from_yaml(str(grammar_file))
+        assert grammar.parse("half")(None) == 0.5
+        assert resolve_type("Frac").__name__ == "Fraction"
+
+    def test_pickle(self, tmp_path):
+        grammar_file = tmp_path / "grammar.yml"
+        grammar_file.write_text(
+            "start: bool\n"
+            "rules:\n"
+            "- lhs: bool\n"
+            "  rhs: [bool, bool]\n"
+            "  name: and\n"
+            "  func: 'lambda p1, p2: p1 and p2'\n"
+            "- lhs: bool\n"
+            "  rhs:\n"
+            "  name: even\n"
+            "  func: 'lambda ref: ref.num % 2 == 0'\n"
+        )
+        grammar = Grammar.from_yaml(str(grammar_file))
+        expression = grammar.parse("and(even, even)")
+        expression.evaluate(TestGrammar.universe)
+
+        new_grammar = pickle.loads(pickle.dumps(grammar))
+        assert [str(rule) for rule in new_grammar.get_all_rules()] == [
+            str(rule) for rule in grammar.get_all_rules()
+        ]
+        new_expression = pickle.loads(pickle.dumps(expression))
+        assert str(new_expression) == str(expression)
+        assert new_expression.meaning == expression.meaning
+        # functions are rebuilt from the compiled-function cache
+        assert new_expression.func is expression.func
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(len, expression).result() == 3
+
+    def test_enumerate_best_first(self):
+        def unique_key(expr):
+            return tuple(expr(referent) for referent in TestGrammar.referents)
+
+        shortest = {}
+        for expr in TestGrammar.grammar.enumerate(depth=3):
+            meaning = unique_key(expr)
+            shortest[meaning] = min(len(expr), shortest.get(meaning, len(expr)))
+
+        best_first = TestGrammar.grammar.get_unique_expressions(
+            depth=3,
+            unique_key=unique_key,
+            compare_func=lambda e1, e2: len(e1) < len(e2),
+            best_first=True,
+        )
+        assert {meaning: len(expr) for meaning, expr in best_first.items()} == shortest
+
+        lengths = [
+            len(expr) for expr in TestGrammar.grammar.enumerate_best_first(max_cost=5)
+        ]
+        assert lengths == sorted(lengths)
+        # the smallest expressions, >(x, y) for terminals x and y, are exactly those of depth 1
+        assert len(list(TestGrammar.grammar.enumerate_best_first(max_cost=3))) == len(
+            list(TestGrammar.grammar.enumerate(depth=2))
+        )
+
+    def test_target_expressions(self):
+        def unique_key(expr):
+            return tuple(expr(referent) for referent in TestGrammar.referents)
+
+        always_true = (True, True, True, True)
+        geq2 = (False, False, False, True)
+        impossible = (True, False, True, False)
+        found, unreachable = TestGrammar.grammar.get_target_expressions(
+            [always_true, geq2, impossible], unique_key, depth=3
+        )
+        assert unreachable == {impossible}
+        assert set(found) == {always_true, geq2}
+        assert len(found[always_true]) == 3
+        assert unique_key(found[geq2]) == geq2
+
+    def test_structure(self):
+        parsed_expression = TestGrammar.grammar.parse(TestGrammar.geq2_expr_str)
+        assert parsed_expression.depth() == 2
+        assert parsed_expression.term_expression == TestGrammar.geq2_expr_str
+        # hashing is structural, so it doesn't change when an expression is evaluated
+        other_expression = TestGrammar.grammar.parse(TestGrammar.geq2_expr_str)
+        other_expression.evaluate(Universe(tuple(TestGrammar.referents)))
+        assert hash(parsed_expression) == hash(other_expression)
+        assert len(parsed_expression.children[1]) == 3
+
+    def test_algebraic_properties(self):
+        def boolean_grammar(**properties) -> Grammar:
+            grammar = Grammar(bool)
+            binary = {
+                key: properties.get(key, False) for key in ("commutative", "idempotent")
+            }
+            unary = {"involutive": properties.get("involutive", False)}
+            grammar.add_rule(
+                Rule("and", bool, (bool, bool), lambda p, q: p and q, **binary)
+            )
+            grammar.add_rule(
+                Rule("or", bool, (bool, bool), lambda p, q: p or q, **binary)
+            )
+            grammar.add_rule(Rule("not", bool, (bool,), lambda p: not p, **unary))
+            grammar.add_rule(Rule("even", bool, None, lambda model: model.num % 2 == 0))
+            grammar.add_rule(Rule("small", bool, None, lambda model: model.num < 2))
+            return grammar
+
+        def unique_key(expr):
+            return tuple(expr(referent) for referent in TestGrammar.referents)
+
+        plain = boolean_grammar()
+        symmetric = boolean_grammar(commutative=True, idempotent=True, involutive=True)
+        assert len(list(symmetric.enumerate(depth=3))) < len(
+            list(plain.enumerate(depth=3))
+        )
+        # no shortest expression is lost
+        for best_first in (False, True):
+            shortest = [
+                {
+                    meaning: len(expr)
+                    for meaning, expr in grammar.get_unique_expressions(
+                        depth=3,
+                        unique_key=unique_key,
+                        compare_func=lambda e1, e2: len(e1) < len(e2),
+                        best_first=best_first,
+                    ).items()
+                }
+                for grammar in (plain, symmetric)
+            ]
+            assert shortest[0] == shortest[1]
+        # each multiset of children is only built once
+        strings = {str(expr) for expr in symmetric.enumerate(depth=2)}
+        assert "and(even, small)" in strings
+        assert "and(small, even)" not in strings
+        assert "and(even, even)" not in strings
+        assert "not(not(even))" not in {
+            str(expr) for expr in symmetric.enumerate_best_first(max_cost=3)
+        }
+
+        with pytest.raises(ValueError):
+            Rule(">", bool, (int, int), lambda x, y: x > y, idempotent=True)
+        with pytest.raises(ValueError):
+            Rule("+", int, (int, bool), lambda x, y: x + y, commutative=True)
+        with pytest.raises(ValueError):
+            Rule("n", int, None, lambda model: model.num, involutive=True)
+
+    def test_enumerate_by_size(self):
+        grammar = TestGrammar.grammar
+        # every rule is binary or terminal, so every expression has an odd number of nodes
+        assert grammar.is_productive_at_size(bool, 5)
+        assert not grammar.is_productive_at_size(bool, 4)
+        assert not grammar.is_productive_at_size(bool, 1)
+
+        by_size = [str(expr) for expr in grammar.enumerate_by_size(5)]
+        by_depth = [str(expr) for expr in grammar.enumerate(depth=3) if len(expr) <= 5]
+        assert sorted(by_size) == sorted(by_depth)
+        lengths = [len(expr) for expr in grammar.enumerate_by_size(5)]
+        assert lengths == sorted(lengths)
+
+        def unique_key(expr):
+            return tuple(expr(referent) for referent in TestGrammar.referents)
+
+        unique = grammar.get_unique_expressions(
+            depth=None,
+            unique_key=unique_key,
+            compare_func=lambda e1, e2: len(e1) < len(e2),
+            size=5,
+        )
+        shortest = {}
+        for expr in grammar.enumerate(depth=3):
+            if len(expr) <= 5:
+                meaning = unique_key(expr)
+                shortest[meaning] = min(len(expr), shortest.get(meaning, len(expr)))
+        assert {meaning: len(expr) for meaning, expr in unique.items()} == shortest
+
+    def test_inside(self):
+        grammar = TestGrammar.grammar
+        universe = Universe(tuple(TestGrammar.referents))
+        rules = {rule.name: rule for rule in grammar.get_all_rules()}
+
+        def probability(expr: GrammaticalExpression) -> float:
+            return grammar.rule_probability(rules[expr.rule_name]) * math.prod(
+                probability(child) for child in expr.children or ()
+            )
+
+        # brute force: aggregate over all expressions
+        expected = {}
+        for expr in grammar.enumerate(depth=3):
+            meaning = expr.evaluate(universe)
+            prob, length, cost = expected.get(meaning, (0.0, 0.0, math.inf))
+            expected[meaning] = (
+                prob + probability(expr),
+                length + probability(expr) * len(expr),
+                min(cost, len(expr)),
+            )
+
+        scores = grammar.inside(universe, depth=3)
+        assert set(scores) == set(expected)
+        for meaning, (prob, length, cost) in expected.items():
+            score = scores[meaning]
+            assert isinstance(score, InsideScore)
+            assert math.isclose(score.probability, prob)
+            assert math.isclose(score.expected_length, length / prob)
+            assert score.min_cost == cost
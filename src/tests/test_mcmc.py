@@ -0,0 +1,77 @@
+import math
+from collections import Counter
+
+from ultk.language.grammar import Grammar, Rule, compile_func
+from ultk.language.mcmc import SubtreeRegenerationSampler, run_chains
+from ultk.language.semantics import Referent
+
+
+class TestMCMC:
+    referents = [Referent(str(num), {"num": num}) for num in range(4)]
+
+    # functions compiled from source, so that the grammar can be sent to other processes
+    grammar = Grammar(bool)
+    grammar.add_rule(
+        Rule("and", bool, (bool, bool), compile_func("lambda p, q: p and q"))
+    )
+    grammar.add_rule(Rule("not", bool, (bool,), compile_func("lambda p: not p")))
+    grammar.add_rule(
+        Rule(
+            "even", bool, None, compile_func("lambda ref: ref.num % 2 == 0"), weight=2.0
+        )
+    )
+    grammar.add_rule(
+        Rule("small", bool, None, compile_func("lambda ref: ref.num < 2"), weight=2.0)
+    )
+
+    def test_prior(self):
+        # without data, the chain should sample from the prior (restricted to the depth bound)
+        sampler = SubtreeRegenerationSampler(TestMCMC.grammar, [], max_depth=3)
+        result = sampler.run(40000, seed=0, burn_in=1000)
+        counts = Counter(str(expr) for expr in result["samples"])
+
+        support = list(TestMCMC.grammar.enumerate(depth=3))
+        probabilities = {
+            str(expr): math.exp(TestMCMC.grammar.log_probability(expr))
+            for expr in support
+        }
+        total = sum(probabilities.values())
+        for expr_str in ("even", "small", "not(even)", "and(even, small)"):
+            assert math.isclose(
+                counts[expr_str] / len(result["samples"]),
+                probabilities[expr_str] / total,
+                abs_tol=0.02,
+            )
+        assert set(counts) <= set(probabilities)
+
+    def test_posterior(self):
+        # "odd and small" only holds of 1
+        data = [(referent, referent.num == 1) for referent in TestMCMC.referents] * 5
+        sampler = SubtreeRegenerationSampler(TestMCMC.grammar, data, max_depth=4)
+        result = sampler.run(3000, seed=1)
+        best = result["samples"][
+            result["log_posteriors"].index(max(result["log_posteriors"]))
+        ]
+        assert [best(referent) for referent in TestMCMC.referents] == [
+            False,
+            True,
+            False,
+            False,
+        ]
+        assert math.isclose(
+            max(result["log_posteriors"]),
+            sampler.log_prior(best) + sampler.log_likelihood(best),
+        )
+        assert 0 < result["acceptance_rate"] < 1
+
+    def test_chains(self):
+        data = [(referent, referent.num < 2) for referent in TestMCMC.referents]
+        sampler = SubtreeRegenerationSampler(TestMCMC.grammar, data, max_depth=4)
+        results = run_chains(sampler, 2, 200, seed=0, max_workers=2, thin=10)
+        assert len(results) == 2
+        assert all(len(result["samples"]) == 20 for result in results)
+        # seeding is reproducible
+        assert [str(expr) for expr in results[0]["samples"]] == [
+            str(expr)
+            for expr in run_chains(sampler, 2, 200, seed=0, thin=10)[0]["samples"]
+        ]
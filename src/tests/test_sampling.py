@@ -0,0 +1,253 @@
+import itertools
+from math import comb
+
+import numpy as np
+import pytest
+
+from ultk.language.language import Expression, Language
+from ultk.language.sampling import (
+    BitmaskLanguages,
+    all_languages,
+    all_meanings,
+    bitmask_indices,
+    bitmasks_to_matrix,
+    combination_rank,
+    combination_unrank,
+    random_combinations,
+    random_distinct_ranks,
+    random_language_bitmasks,
+    random_languages,
+    gray_code_meanings,
+    meaning_from_bitmask,
+    parallel_quasi_natural,
+    plan_quasi_natural_quotas,
+    powerset,
+    quasi_natural_languages,
+    sample_quasi_natural,
+    size_quotas,
+    stream_quasi_natural,
+    subset_rank,
+    subset_unrank,
+    subsets_in_range,
+)
+from ultk.language.semantics import Meaning, Referent, Universe
+from ultk.util.frozendict import FrozenDict
+
+referents = tuple(Referent(str(num), {"num": num}) for num in range(4))
+universe = Universe(referents)
+
+
+class TestSampling:
+    expressions = [
+        Expression(
+            f"expr-{idx}",
+            Meaning(
+                FrozenDict({ref: ref.num == idx % 4 for ref in referents}), universe
+            ),
+        )
+        for idx in range(10)
+    ]
+
+    def test_bitmasks(self):
+        rng = np.random.default_rng(0)
+        bitmasks = random_language_bitmasks(10, 1023, rng)
+        assert bitmasks.shape == (1023, 2)
+        # every non-empty subset exactly once
+        subsets = {tuple(bitmask_indices(bitmask, 10)) for bitmask in bitmasks}
+        assert len(subsets) == 1023
+        assert () not in subsets
+        assert max(max(subset) for subset in subsets) == 9
+
+        with pytest.raises(ValueError):
+            random_language_bitmasks(3, 8, rng)
+
+        # each expression is included about half the time
+        bitmasks = random_language_bitmasks(100, 2000, rng)
+        inclusion = np.unpackbits(bitmasks, axis=1, count=100, bitorder="little")
+        assert np.allclose(inclusion.mean(axis=0), 0.5, atol=0.1)
+
+    def test_lazy_languages(self):
+        bitmasks = random_language_bitmasks(10, 50, np.random.default_rng(1))
+        languages = BitmaskLanguages(bitmasks, TestSampling.expressions)
+        assert len(languages) == 50
+        assert len(languages[10:20]) == 10
+        language = languages[3]
+        assert isinstance(language, Language)
+        assert language.expressions == frozenset(
+            TestSampling.expressions[idx] for idx in languages.indices(3)
+        )
+
+    def test_random_languages(self):
+        languages = random_languages(TestSampling.expressions, sample_size=100)
+        assert len(languages) == 100
+        assert len({language.expressions for language in languages}) == 100
+
+    def test_combination_ranks(self):
+        # colexicographic order
+        combinations = sorted(
+            itertools.combinations(range(6), 3), key=lambda c: tuple(reversed(c))
+        )
+        for rank, combination in enumerate(combinations):
+            assert combination_rank(combination) == rank
+            assert combination_unrank(rank, 6, 3) == combination
+        big_combination = tuple(range(0, 3000, 2))
+        assert (
+            combination_unrank(combination_rank(big_combination), 3000, 1500)
+            == big_combination
+        )
+        with pytest.raises(ValueError):
+            combination_unrank(comb(6, 3), 6, 3)
+
+    def test_unique_sampling(self):
+        rng = np.random.default_rng(0)
+        assert sorted(random_distinct_ranks(100, 100, rng)) == list(range(100))
+        ranks = random_distinct_ranks(10**40, 1000, rng)
+        assert len(set(ranks)) == 1000
+        # exhaustive, and far from exhaustive
+        assert len(set(random_combinations(20, 17, comb(20, 17), rng))) == comb(20, 17)
+        combinations = random_combinations(100, 10, 500, rng)
+        assert len(set(combinations)) == 500
+        assert all(len(set(combination)) == 10 for combination in combinations)
+
+        assert size_quotas({1: 3, 2: 10, 3: 100}, 50, rng) == {1: 3, 2: 10, 3: 37}
+        assert sum(size_quotas({1: 10, 2: 10}, 15, rng).values()) == 15
+
+        # all but one language of each size up to 3
+        languages = random_languages(
+            TestSampling.expressions,
+            sampling_strategy="stratified",
+            sample_size=sum(comb(10, size) for size in range(1, 4)) - 3,
+            max_size=3,
+        )
+        assert len({language.expressions for language in languages}) == len(languages)
+        assert max(len(language) for language in languages) == 3
+
+        result = sample_quasi_natural(
+            Language,
+            TestSampling.expressions[:6],
+            TestSampling.expressions[6:],
+            lang_size=3,
+            sample_size=12,
+            id_start=0,
+        )
+        assert len(result["languages"]) == 12
+
+    def test_subset_ranks(self):
+        subsets = list(powerset(range(5)))
+        for rank, subset in enumerate(subsets):
+            assert subset_rank(subset, 5) == rank
+            assert subset_unrank(rank, 5) == subset
+        assert list(subsets_in_range(5, 7, 20)) == subsets[7:20]
+        assert list(subsets_in_range(5, 25)) == subsets[25:]
+        with pytest.raises(ValueError):
+            subset_unrank(len(subsets), 5)
+
+    def test_shards(self):
+        expressions = TestSampling.expressions[:6]
+        languages = [
+            language.expressions for language in all_languages(expressions, max_size=4)
+        ]
+        shards = [
+            [
+                language.expressions
+                for language in all_languages(
+                    expressions, max_size=4, shard=shard, num_shards=4
+                )
+            ]
+            for shard in range(4)
+        ]
+        assert sum(shards, []) == languages
+        assert {len(shard) for shard in shards} <= {
+            len(languages) // 4,
+            len(languages) // 4 + 1,
+        }
+        assert [
+            language.expressions
+            for language in all_languages(expressions, start=10, stop=15)
+        ] == languages[10:15]
+
+        meanings = list(all_meanings(universe))
+        assert list(all_meanings(universe, shard=1, num_shards=2)) == meanings[7:]
+
+    def test_quasi_natural_stream(self):
+        rng = np.random.default_rng(0)
+        quotas = plan_quasi_natural_quotas(6, 4, range(1, 4), 60, rng)
+        assert sum(quotas.values()) == 60
+        # all languages of size 1 (of either degree) fit in their share
+        assert quotas[1, 0] == 4 and quotas[1, 1] == 6
+        for (lang_size, num_natural), quota in quotas.items():
+            assert quota <= comb(6, num_natural) * comb(4, lang_size - num_natural)
+
+        languages = list(stream_quasi_natural(6, 4, quotas, rng))
+        assert len(set(languages)) == 60
+        for (lang_size, num_natural), quota in quotas.items():
+            assert quota == sum(
+                len(indices) == lang_size
+                and sum(idx < 6 for idx in indices) == num_natural
+                for indices in languages
+            )
+
+        # more languages than exist
+        assert sum(plan_quasi_natural_quotas(6, 4, [2], 1000).values()) == comb(10, 2)
+
+        languages = list(
+            quasi_natural_languages(
+                Language,
+                TestSampling.expressions[:6],
+                TestSampling.expressions[6:],
+                [2, 3],
+                20,
+                rng,
+            )
+        )
+        assert len({language.expressions for language in languages}) == 20
+
+    def test_reproducible(self):
+        def sample(seed):
+            return [
+                language.expressions
+                for language in random_languages(
+                    TestSampling.expressions,
+                    "stratified",
+                    100,
+                    rng=np.random.default_rng(seed),
+                )
+            ]
+
+        assert sample(0) == sample(0)
+        assert sample(0) != sample(1)
+
+        quotas = plan_quasi_natural_quotas(6, 4, range(1, 5), 200)
+        languages = parallel_quasi_natural(6, 4, quotas, seed=0, max_workers=1)
+        assert len(set(languages)) == 200
+        # independent of the number of workers
+        assert parallel_quasi_natural(6, 4, quotas, seed=0, max_workers=3) == languages
+
+    def test_gray_code_meanings(self):
+        meanings = list(gray_code_meanings(4))
+        bitmasks = [bitmask for bitmask, _ in meanings]
+        assert sorted(bitmasks) == list(range(1, 16))
+        # consecutive meanings differ in exactly the one referent reported
+        previous = 0
+        for bitmask, changed in meanings:
+            assert bin(changed).count("1") == 1
+            assert bitmask ^ previous == changed
+            previous = bitmask
+
+        pairs = [bitmask for bitmask, _ in gray_code_meanings(4, sizes=[2])]
+        assert sorted(pairs) == sorted(
+            bitmask for bitmask in range(16) if bin(bitmask).count("1") == 2
+        )
+
+        matrix = bitmasks_to_matrix(bitmasks, 4)
+        assert matrix.shape == (15, 4)
+        assert matrix.dtype == bool
+        assert list(matrix[1]) == [True, True, False, False]
+
+        meaning = meaning_from_bitmask(0b0101, universe)
+        assert [meaning[referent] for referent in referents] == [
+            True,
+            False,
+            True,
+            False,
+        ]
@@ -15,4 +15,8 @@ The `ultk.effcomm.information_bottleneck` submodule contains tools for Informati
 The `ultk.effcomm.agent` submodule implements classes for constructing various speakers and listeners of a language. These are unified abstractions from the Rational Speech Act framework.
 
 The `ultk.effcomm.informativity` submodule implements tools for computing the literal or pragmatic informativity of a language, based on speaker/listener  abstractions described above.
+
+The `ultk.effcomm.rsa` submodule implements the recursive reasoning of these agents, to any depth or to a fixed point, in log-space and for whole batches of languages at once.
+
+The `ultk.effcomm.signaling` submodule simulates many Lewis-Skyrms signaling games at once, in which senders and receivers learn a language by Roth-Erev reinforcement.
 """
@@ -2,15 +2,28 @@
 
 from typing import Any
 import numpy as np
+from scipy import sparse
 from scipy.special import softmax
 from ultk.language.language import Expression, Language
-from ultk.language.semantics import Referent
+from ultk.language.semantics import Meaning, Referent
+from ultk.util.frozendict import FrozenDict
 
 ##############################################################################
 # Base communicative agent class
 ##############################################################################
 
 
+def normalize_rows(weights: Any) -> Any:
+    """Divide each row of a (dense or `scipy.sparse`) matrix by its sum, leaving rows which sum to 0 as zeros."""
+    sums = np.asarray(weights.sum(axis=1)).ravel()
+    inverse = np.divide(
+        1.0, sums, out=np.zeros(len(sums), dtype=float), where=sums != 0
+    )
+    if sparse.issparse(weights):
+        return sparse.csr_array(weights.multiply(inverse[:, None]))
+    return weights * inverse[:, None]
+
+
 class CommunicativeAgent:
     def __init__(self, language: Language, **kwargs):
         """An agent that uses a language to communicate, e.g. a RSA pragmatic agent or a Lewis-Skyrms signaler.
@@ -102,6 +115,13 @@ class CommunicativeAgent:
         """
         raise NotImplementedError
 
+    def expressions_by_referents(self, weights: Any) -> Any:
+        """Orient a matrix of the shape of the agent's weights as |E|-by-|M|, i.e. with a row for each expression.
+
+        Subclasses implement this according to the layout of their weights.
+        """
+        raise NotImplementedError
+
     def sample_strategy(self, index: int) -> int:
         """Sample a communicative strategy (e.g., a word for Speaker's intended referent, or interpretation for Listener's heard word) by uniformly sampling from a row vector of the agent's weight matrix specified by the index.
 
@@ -111,7 +131,10 @@ class CommunicativeAgent:
         Returns:
             the integer index of the agent's choice
         """
-        choices = self.weights[index]
+        choices = self.weights[[index]]
+        if sparse.issparse(choices):
+            choices = choices.toarray()
+        choices = np.ravel(choices)
         choices_normalized = choices / choices.sum()
         return np.random.choice(a=range(len(choices)), p=choices_normalized)
 
@@ -137,41 +160,34 @@ class CommunicativeAgent:
         """
         # Construct the same kind of language as initialized with
         language_type = type(self.language)
-        expression_type = type(self.language.expressions[0])
-        meaning_type = type(self.language.expressions[0].meaning)
-
-        # get distribution over communicative policies from a weight matrix
-        policies = self.normalized_weights()
-
-        expressions = []
-        # loop over agent's vocabulary
-        for old_expression in self.language.expressions:
-            # get all meanings that the expression can communicate
-            referents = tuple(
-                [
-                    referent
-                    for referent in self.language.universe.referents
-                    if policies[
-                        self.strategy_to_indices(
-                            strategy={
-                                "referent": referent,
-                                "expression": old_expression,
-                            }
-                        )
-                    ]
-                    > threshold  # if probability of referent is high enough
-                ]
+        expression_type = type(self._index_to_expression[0])
+        meaning_type = type(self._index_to_expression[0].meaning)
+        universe = self.language.universe
+
+        # which referents each expression can communicate, i.e. whose probability is high enough,
+        # thresholding the whole distribution over communicative policies at once
+        can_express = (
+            self.expressions_by_referents(self.normalized_weights()) > threshold
+        )
+        if sparse.issparse(can_express):
+            can_express = can_express.toarray()
+
+        expressions = [
+            # the updated expression as a new form-meaning mapping
+            expression_type(
+                form=old_expression.form,
+                meaning=meaning_type(
+                    FrozenDict(zip(universe.referents, row.tolist())), universe
+                ),
             )
+            for old_expression, row in zip(self._index_to_expression, can_express)
+        ]
 
-            meaning = meaning_type(referents, self.language.universe)
-            # construct the updated expression as a new form-meaning mapping
-            expression = expression_type(form=old_expression.form, meaning=meaning)
-            expressions.append(expression)
-
-        if "name" not in data:
+        data = dict(data)
+        if "name" not in data and hasattr(self, "name"):
             data["name"] = self.name
 
-        return language_type(expressions, data=data)
+        return language_type(tuple(expressions), data=data)
 
 
 ##############################################################################
@@ -191,11 +207,22 @@ class Speaker(CommunicativeAgent):
     def S(self, mat: np.ndarray) -> None:
         self.weights = mat
 
+    def strategy_to_indices(self, strategy: dict[str, Any]) -> tuple[int]:
+        return (
+            self.referent_to_index(strategy["referent"]),
+            self.expression_to_index(strategy["expression"]),
+        )
+
+    def expressions_by_referents(self, weights: Any) -> Any:
+        return weights.T
+
     def normalized_weights(self) -> np.ndarray:
         """Get the normalized weights of a Speaker.
 
         Each row vector represents a conditional probability distribution over expressions, P(e | m).
         """
+        if sparse.issparse(self.S):
+            return normalize_rows(self.S)
         # The sum of p(e | intended m) must be exactly 0 or 1.
         # We check for nans because sometimes a language cannot express a particular meaning at all, resulting in a row sum of 0.
         np.seterr(divide="ignore", invalid="ignore")
@@ -214,8 +241,19 @@ class Listener(CommunicativeAgent):
     def R(self, mat: np.ndarray) -> None:
         self.weights = mat
 
+    def strategy_to_indices(self, strategy: dict[str, Any]) -> tuple[int]:
+        return (
+            self.expression_to_index(strategy["expression"]),
+            self.referent_to_index(strategy["referent"]),
+        )
+
+    def expressions_by_referents(self, weights: Any) -> Any:
+        return weights
+
     def normalized_weights(self) -> np.ndarray:
         """Normalize the weights of a Listener so that each row vector for the heard expression e represents a conditional probability distribution over referents P(m | e)."""
+        if sparse.issparse(self.R):
+            return normalize_rows(self.R)
         # The sum of p(m | heard e) must be 1. We can safely divide each row by its sum because every expression has at least one meaning.
         return self.R / self.R.sum(axis=1, keepdims=True)
 
@@ -230,18 +268,30 @@ class Listener(CommunicativeAgent):
 class LiteralSpeaker(Speaker):
     """A literal speaker chooses utterances without any reasoning about other agents. The literal speaker's conditional probability distribution P(e|m) is uniform over all expressions that can be used to communicate a particular meaning. This is in contrast to a pragmatic speaker, whose conditional distribution is not uniform in this way, but instead biased towards choosing expressions that are less likely to be misinterpreted by some listener."""
 
-    def __init__(self, language: Language, **kwargs):
+    def __init__(self, language: Language, sparse: bool = False, **kwargs):
+        """
+        Args:
+            language: the language of the speaker
+
+            sparse: whether to store the weights as a `scipy.sparse` matrix, e.g. for large universes
+        """
         super().__init__(language, **kwargs)
-        self.S = self.language.binary_matrix()
+        self.S = self.language.binary_matrix(sparse=sparse)
         self.S = self.normalized_weights()
 
 
 class LiteralListener(Listener):
     """A naive literal listener interprets utterances without any reasoning about other agents. Its conditional probability distribution P(m|e) for guessing meanings is uniform over all meanings that can be denoted by the particular expression heard. This is in contrast to a pragmatic listener, whose conditional distribution is biased to guess meanings that a pragmatic speaker most likely intended."""
 
-    def __init__(self, language: Language, **kwargs):
+    def __init__(self, language: Language, sparse: bool = False, **kwargs):
+        """
+        Args:
+            language: the language of the listener
+
+            sparse: whether to store the weights as a `scipy.sparse` matrix, e.g. for large universes
+        """
         super().__init__(language, **kwargs)
-        self.R = self.language.binary_matrix().T
+        self.R = self.language.binary_matrix(sparse=sparse).T
         self.R = self.normalized_weights()
 
 
@@ -270,6 +320,25 @@ class PragmaticSpeaker(Speaker):
         """
         super().__init__(language, **kwargs)
 
+        if sparse.issparse(listener.R):
+            # the softmax of t * log(R) is R ** t, normalized; referents which the listener never guesses
+            # get a uniform distribution, as in the dense case
+            weights = sparse.csr_array(listener.R.T).power(temperature)
+            unreachable = np.flatnonzero(np.asarray(weights.sum(axis=1)).ravel() == 0)
+            num_expressions = weights.shape[1]
+            uniform = sparse.csr_array(
+                (
+                    np.ones(len(unreachable) * num_expressions),
+                    (
+                        np.repeat(unreachable, num_expressions),
+                        np.tile(np.arange(num_expressions), len(unreachable)),
+                    ),
+                ),
+                shape=weights.shape,
+            )
+            self.S = normalize_rows(weights + uniform)
+            return
+
         # Row vector \propto column vector of literal R
         self.S = softmax(np.nan_to_num(np.log(listener.R.T)) * temperature, axis=1)
 
@@ -291,12 +360,20 @@ class PragmaticListener(Listener):
 
             speaker: a communicative agent storing a matrix S representing the  conditional distribution over expressions given meanings.
 
-            prior: a diagonal matrix of size |M|-by-|M| representing the communicative need probabilities for meanings.
+            prior: the communicative need probabilities for meanings, either as a vector of size |M|, or as a diagonal matrix of size |M|-by-|M|.
         """
         super().__init__(language, **kwargs)
         # Row vector \propto column vector of pragmatic S
 
-        self.R = np.zeros_like(speaker.S.T)
-        for i in range(len(self.R)):
-            col = speaker.S[:, i]
-            self.R[i] = col @ prior / np.sum(col @ prior)
+        # row i is column i of S times the prior, normalized
+        if np.ndim(prior) == 1:
+            if sparse.issparse(speaker.S):
+                joint = speaker.S.T.multiply(np.asarray(prior)[None, :])
+            else:
+                joint = speaker.S.T * prior
+        else:
+            joint = speaker.S.T @ prior
+        if sparse.issparse(joint):
+            self.R = normalize_rows(joint)
+        else:
+            self.R = joint / joint.sum(axis=1, keepdims=True)
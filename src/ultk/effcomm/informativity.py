@@ -2,8 +2,12 @@
 
 import numpy as np
 from cmath import isclose
-from typing import Callable
-from ultk.language.language import Language
+from collections import OrderedDict
+from functools import lru_cache
+from scipy.sparse import issparse
+from scipy.special import softmax
+from typing import Callable, Sequence
+from ultk.language.language import Expression, Language
 from ultk.language.semantics import Referent, Universe
 from ultk.effcomm.agent import (
     Speaker,
@@ -15,16 +19,54 @@ from ultk.effcomm.agent import (
 )
 
 
-def build_utility_matrix(
-    universe: Universe, utility: Callable[[Referent, Referent], float]
-) -> np.ndarray:
-    """Construct the square matrix specifying the utility function defined for pairs of meanings, used for computing communicative success."""
-    return np.array(
-        [
-            [utility(ref, ref_) for ref_ in universe.referents]
-            for ref in universe.referents
-        ]
-    )
+class VectorizedUtility:
+    """A utility function over pairs of referents which can also compute its whole matrix at once.
+
+    It can be used wherever a utility function is expected; `build_utility_matrix` uses `matrix` instead of
+    calling it on every pair of referents.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[Referent, Referent], float],
+        matrix_func: Callable[[Universe], np.ndarray],
+    ):
+        """
+        Args:
+            func: the utility of a pair of referents
+
+            matrix_func: the square matrix of utilities of all pairs of referents of a universe
+        """
+        self.func = func
+        self.matrix_func = matrix_func
+
+    def __call__(self, ref1: Referent, ref2: Referent) -> float:
+        return self.func(ref1, ref2)
+
+    def matrix(self, universe: Universe) -> np.ndarray:
+        return np.asarray(self.matrix_func(universe), dtype=float)
+
+    @classmethod
+    def from_property(
+        cls, name: str, func: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    ) -> "VectorizedUtility":
+        """A utility which only depends on a property of the referents, computed by a numpy function of the
+        property values which broadcasts, e.g. `lambda x, y: np.exp(-np.abs(x - y))`.
+
+        Args:
+            name: the name of the property
+
+            func: the utility of property values; it's called once with a column and a row of the values of all referents
+        """
+
+        def matrix_func(universe: Universe) -> np.ndarray:
+            values = np.array([getattr(ref, name) for ref in universe.referents])
+            return func(values[:, None], values[None, :])
+
+        return cls(
+            lambda ref1, ref2: float(func(getattr(ref1, name), getattr(ref2, name))),
+            matrix_func,
+        )
 
 
 def indicator_utility(ref1: Referent, ref2: Referent) -> float:
@@ -32,11 +74,49 @@ def indicator_utility(ref1: Referent, ref2: Referent) -> float:
     return float(ref1 == ref2)
 
 
+def build_utility_matrix(
+    universe: Universe, utility: Callable[[Referent, Referent], float]
+) -> np.ndarray:
+    """Construct the square matrix specifying the utility function defined for pairs of meanings, used for computing communicative success.
+
+    Matrices are cached by universe and utility function (for the most recently used pairs), and so are read-only;
+    copy them to modify them.  The indicator utility gives the identity matrix, and a `VectorizedUtility` its own matrix,
+    without calling the utility on every pair of referents.
+    """
+    try:
+        return _cached_utility_matrix(universe, utility)
+    except TypeError:
+        # unhashable utility function
+        return _utility_matrix(universe, utility)
+
+
+def _utility_matrix(
+    universe: Universe, utility: Callable[[Referent, Referent], float]
+) -> np.ndarray:
+    if utility is indicator_utility:
+        matrix = np.eye(len(universe.referents))
+    elif isinstance(utility, VectorizedUtility):
+        matrix = utility.matrix(universe)
+    else:
+        matrix = np.array(
+            [
+                [utility(ref, ref_) for ref_ in universe.referents]
+                for ref in universe.referents
+            ]
+        )
+    matrix.flags.writeable = False
+    return matrix
+
+
+_cached_utility_matrix = lru_cache(maxsize=32)(_utility_matrix)
+
+
 def informativity(
     language: Language,
     prior: np.ndarray,
     utility: Callable[[Referent, Referent], float] = indicator_utility,
     agent_type: str = "literal",
+    sparse: bool = False,
 ) -> float:
     """The informativity of a language is identified with the successful communication between a speaker and a listener.
 
@@ -51,6 +131,8 @@ def informativity(
 
         kind: {"literal, pragmatic"} Whether to measure informativity using literal or pragmatic agents, as canonically described in the Rational Speech Act framework. The default is "literal".
 
+        sparse: whether the agents store their weights as `scipy.sparse` matrices, e.g. for large universes. With the indicator utility, no |M|-by-|M| matrix is built at all.
+
     *Concepts*:
         The speaker can be thought of as a conditional distribution over expressions given meanings. The listener is likewise a conditional distribution over meanings given expressions. The communicative need, or cognitive source, is a prior probability over meanings representing how frequently agents need to use certain meanings in communication. The utility function represents the similarity, or appropriateness, of the listener's guess m' about the speaker's intended meaning m.
 
@@ -67,25 +149,31 @@ def informativity(
     if not language.expressions:
         raise ValueError(f"language empty: {language}")
 
-    speaker = LiteralSpeaker(language)
-    listener = LiteralListener(language)
+    speaker = LiteralSpeaker(language, sparse=sparse)
+    listener = LiteralListener(language, sparse=sparse)
 
     if agent_type == "literal":
         pass
     elif agent_type == "pragmatic":
         speaker = PragmaticSpeaker(language, listener)
-        listener = PragmaticListener(language, speaker, np.diag(prior))
+        listener = PragmaticListener(language, speaker, prior)
     else:
         raise ValueError(
             f"agent_type must be either 'literal' or 'pragmatic'. Received: {agent_type}."
         )
 
-    inf = communicative_success(speaker, listener, prior, utility)
+    if utility is indicator_utility:
+        inf = communicative_success(speaker, listener, prior, utility)
+        is_indicator = True
+    else:
+        # built once, for both communicative success and the check
+        utility_matrix = build_utility_matrix(speaker.language.universe, utility)
+        inf = communicative_success(speaker, listener, prior, utility_matrix)
+        m, _ = utility_matrix.shape  # square matrix
+        is_indicator = np.array_equal(utility_matrix, np.eye(m))
 
     # Check informativity > 0
-    utility_matrix = build_utility_matrix(speaker.language.universe, utility)
-    m, _ = utility_matrix.shape  # square matrix
-    if np.array_equal(utility_matrix, np.eye(m)):
+    if is_indicator:
         if isclose(inf, 0.0):
             raise ValueError(
                 f"Informativity must be nonzero for indicator utility reward function, but was: {inf}"
@@ -98,7 +186,7 @@ def communicative_success(
     speaker: Speaker,
     listener: Listener,
     prior: np.ndarray,
-    utility: Callable[[Referent, Referent], float],
+    utility: Callable[[Referent, Referent], float] | np.ndarray,
 ) -> float:
     """Helper function to compute the literal informativity of a language.
 
@@ -109,6 +197,10 @@ def communicative_success(
 
     $ = \sum \\text{diag}(p)SR \odot U $
 
+    which is computed without forming diag(p) or the |M|-by-|M| product SR, as
+    $\sum_{m, e} p(m) S_{m e} (R U^T)_{e m}$, and with the indicator utility as $\sum_{m, e} p(m) S_{m e} R_{e m}$.
+    The agents' weights may be `scipy.sparse` matrices.
+
     For more details, see [docs/vectorized_informativity](https://github.com/CLMBRs/altk/blob/main/docs/vectorized_informativity.pdf).
 
     Args:
@@ -118,9 +210,350 @@ def communicative_success(
 
         prior: p(m), distribution over meanings representing communicative need
 
-        utility: a function u(m, m') representing similarity of meanings, or pair-wise usefulness of listener guesses about speaker meanings.
+        utility: a function u(m, m') representing similarity of meanings, or pair-wise usefulness of listener guesses about speaker meanings; or its matrix (see `build_utility_matrix`).
     """
     S = speaker.normalized_weights()
     R = listener.normalized_weights()
-    U = build_utility_matrix(speaker.language.universe, utility)
-    return float(np.sum(np.diag(prior) @ S @ R * U))
+    if utility is indicator_utility:
+        expected_utility = R.T
+    else:
+        U = (
+            utility
+            if isinstance(utility, np.ndarray)
+            else build_utility_matrix(speaker.language.universe, utility)
+        )
+        # E[u(m, m') | e] for each m, i.e. (R U^T)^T
+        expected_utility = (R @ U.T).T
+    success = S.multiply(expected_utility) if issparse(S) else S * expected_utility
+    return float(np.asarray(prior) @ np.asarray(success.sum(axis=1)).ravel())
+
+
+def meaning_matrix(
+    languages: Sequence[Language],
+) -> tuple[np.ndarray, list[list[int]]]:
+    """The meanings of the distinct expressions of some languages (all over the same universe), as one matrix.
+
+    Returns:
+        a matrix of shape (number of distinct expressions, |M|) whose rows say which referents each expression
+        can express, and for each language, the indices of the rows of its expressions
+    """
+    universe = languages[0].universe
+    rows: dict[Expression, int] = {}
+    language_indices = []
+    for language in languages:
+        if not language.expressions:
+            raise ValueError(f"language empty: {language}")
+        language_indices.append(
+            [
+                rows.setdefault(expression, len(rows))
+                for expression in language.expressions
+            ]
+        )
+    meanings = np.array(
+        [[float(e.can_express(m)) for m in universe.referents] for e in rows]
+    )
+    return meanings, language_indices
+
+
+def stack_meanings(
+    meanings: np.ndarray, language_indices: Sequence[Sequence[int]]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Stack the binary matrices of some languages, padded to the largest one.
+
+    Args:
+        meanings: a matrix of shape (number of expressions, |M|) of expression meanings (see `meaning_matrix`)
+
+        language_indices: for each language, the indices of the rows of its expressions
+
+    Returns:
+        a tensor of shape (number of languages, largest language size, |M|), with zero rows padding the smaller
+        languages, and a boolean mask of shape (number of languages, largest language size) of the actual expressions
+    """
+    num_languages = len(language_indices)
+    max_size = max(len(indices) for indices in language_indices)
+    padded = np.zeros((num_languages, max_size), dtype=np.intp)
+    mask = np.zeros((num_languages, max_size), dtype=bool)
+    for lang_idx, indices in enumerate(language_indices):
+        if len(indices) == 0:
+            raise ValueError("language empty")
+        padded[lang_idx, : len(indices)] = indices
+        mask[lang_idx, : len(indices)] = True
+    return np.asarray(meanings)[padded] * mask[:, :, None], mask
+
+
+def batch_informativity(
+    languages: Sequence[Language],
+    prior: np.ndarray,
+    utility: Callable[[Referent, Referent], float] = indicator_utility,
+    agent_type: str = "literal",
+    chunk_size: int = 256,
+) -> np.ndarray:
+    """The informativity of many languages at once, as computed by `informativity` for each of them.
+
+    The meanings of all distinct expressions are stacked into one matrix, and the informativities are computed
+    from it with `batch_informativity_from_matrix`.
+
+    Args:
+        languages: the languages, all over the same universe
+
+        prior: a probability distribution representing communicative need (frequency) for Referents.
+
+        utility: a function representing the usefulness of listener guesses about speaker Referents; see `informativity`.
+
+        agent_type: {"literal, pragmatic"} Whether to measure informativity using literal or pragmatic agents.
+
+        chunk_size: the number of languages whose agents are computed together; see `batch_informativity_from_matrix`.
+
+    Returns:
+        an array of the informativity of each language
+    """
+    if not languages:
+        return np.zeros(0)
+    meanings, language_indices = meaning_matrix(languages)
+    return batch_informativity_from_matrix(
+        meanings,
+        language_indices,
+        prior,
+        build_utility_matrix(languages[0].universe, utility),
+        agent_type,
+        chunk_size,
+    )
+
+
+def batch_informativity_from_matrix(
+    meanings: np.ndarray,
+    language_indices: Sequence[Sequence[int]],
+    prior: np.ndarray,
+    utility_matrix: np.ndarray | None = None,
+    agent_type: str = "literal",
+    chunk_size: int = 256,
+) -> np.ndarray:
+    """The informativity of many languages given as sets of rows of a matrix of expression meanings,
+    e.g. from `ultk.language.sampling.bitmasks_to_matrix`.
+
+    Languages are processed in chunks of `chunk_size`, grouped by size: the meanings of the expressions of each
+    chunk are stacked into a tensor padded to its largest language, and the speakers and listeners of the
+    whole chunk are computed with a few array operations, with the padding masked out.  Memory is bounded by
+    chunk_size * (largest language) * |M|^2.
+
+    Args:
+        meanings: a matrix of shape (number of expressions, |M|), whose rows say which referents each expression can express
+
+        language_indices: for each language, the indices of the rows of its expressions
+
+        prior: a probability distribution representing communicative need (frequency) for Referents.
+
+        utility_matrix: the matrix of utilities of pairs of referents (see `build_utility_matrix`); defaults to the identity
+
+        agent_type: {"literal, pragmatic"} Whether to measure informativity using literal or pragmatic agents.
+
+        chunk_size: the number of languages whose agents are computed together.
+
+    Returns:
+        an array of the informativity of each language, in the order of `language_indices`
+    """
+    if agent_type not in ("literal", "pragmatic"):
+        raise ValueError(
+            f"agent_type must be either 'literal' or 'pragmatic'. Received: {agent_type}."
+        )
+    meanings = np.asarray(meanings, dtype=float)
+    num_referents = meanings.shape[1]
+    if utility_matrix is None:
+        utility_matrix = np.eye(num_referents)
+    prior = np.asarray(prior, dtype=float)
+
+    informativities = np.empty(len(language_indices))
+    order = sorted(range(len(language_indices)), key=lambda i: len(language_indices[i]))
+    for start in range(0, len(order), chunk_size):
+        chunk = order[start : start + chunk_size]
+        informativities[chunk] = _chunk_informativity(
+            meanings,
+            [language_indices[idx] for idx in chunk],
+            prior,
+            utility_matrix,
+            agent_type,
+        )
+
+    # Check informativity > 0
+    if np.array_equal(utility_matrix, np.eye(num_referents)):
+        zero = np.flatnonzero(np.isclose(informativities, 0.0))
+        if len(zero):
+            raise ValueError(
+                f"Informativity must be nonzero for indicator utility reward function, but was: {informativities[zero[0]]} for language {zero[0]}"
+            )
+    return informativities
+
+
+def _chunk_informativity(
+    meanings: np.ndarray,
+    language_indices: Sequence[Sequence[int]],
+    prior: np.ndarray,
+    utility_matrix: np.ndarray,
+    agent_type: str,
+) -> np.ndarray:
+    """Informativities of a chunk of languages, as for a LiteralSpeaker/LiteralListener or
+    PragmaticSpeaker/PragmaticListener pair of each language."""
+    # (language, expression, referent), with zero rows padding the smaller languages
+    binary, mask = stack_meanings(meanings, language_indices)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # literal listener P(m | e), rows of the binary matrix normalized; nan for expressions
+        # which can't express anything, as in `LiteralListener`, but 0 for padding
+        listener = binary / binary.sum(axis=2, keepdims=True)
+        listener[~mask] = 0.0
+        if agent_type == "literal":
+            # literal speaker P(e | m), stored transposed: columns normalized, and 0 for inexpressible meanings
+            speaker = np.nan_to_num(binary / binary.sum(axis=1, keepdims=True))
+        else:
+            # pragmatic speaker: softmax over the expressions of log P(m | e), as in `PragmaticSpeaker`
+            logits = np.nan_to_num(np.log(listener))
+            logits[~mask] = -np.inf
+            speaker = softmax(logits, axis=1)
+            # pragmatic listener: P(m | e) proportional to P(e | m) p(m), as in `PragmaticListener`
+            joint = speaker * prior
+            listener = joint / joint.sum(axis=2, keepdims=True)
+            listener[~mask] = 0.0
+            # `communicative_success` renormalizes the (already normalized) weights
+            speaker = np.nan_to_num(speaker / speaker.sum(axis=1, keepdims=True))
+            listener = listener / listener.sum(axis=2, keepdims=True)
+            listener[~mask] = 0.0
+
+    # sum_m p(m) sum_e P(e | m) sum_m' P(m' | e) u(m, m')
+    expected_utility = np.einsum("nek,mk->nem", listener, utility_matrix)
+    return np.einsum("m,nem,nem->n", prior, speaker, expected_utility)
+
+
+class IncrementalInformativity:
+    """Literal informativity of languages, updated incrementally when a language changes by a few expressions,
+    e.g. by the `AddExpression` and `RemoveExpression` mutations of an `EvolutionaryOptimizer`.
+
+    With literal agents, informativity decomposes over referents:
+
+    $I(L) = \\sum_{m} \\frac{p(m)}{d(m)} \\sum_{e \\in L, m \\in e} v_e(m)$, where $v_e(m) = \\frac{1}{|e|} \\sum_{m' \\in e} u(m, m')$
+
+    and d(m) is the number of expressions of L which can express m.  For each language, the counts d(m),
+    the sums over expressions and the informativity are cached, so adding or removing an expression only
+    updates the referents it can express.  The values $v_e$ of each expression are cached as well.
+
+    Calling the evaluator on a language gives its informativity, as `informativity(language, prior, utility)`,
+    from the cache if possible.  `update` derives a language's decomposition from that of a similar language.
+    """
+
+    def __init__(
+        self,
+        universe: Universe,
+        prior: np.ndarray,
+        utility: Callable[[Referent, Referent], float] = indicator_utility,
+        max_languages: int = 100000,
+    ):
+        """
+        Args:
+            universe: the universe of the languages
+
+            prior: a probability distribution representing communicative need (frequency) for Referents.
+
+            utility: a function representing the usefulness of listener guesses about speaker Referents.
+
+            max_languages: the number of most recently used languages whose decompositions are cached.
+        """
+        self.universe = universe
+        self.prior = np.asarray(prior, dtype=float)
+        self.utility_matrix = build_utility_matrix(universe, utility)
+        self.max_languages = max_languages
+        self._referent_to_index = {
+            referent: idx for idx, referent in enumerate(universe.referents)
+        }
+        self._expression_values: dict[Expression, tuple[np.ndarray, np.ndarray]] = {}
+        self._languages: OrderedDict[Language, tuple[np.ndarray, np.ndarray, float]] = (
+            OrderedDict()
+        )
+
+    def _values(self, expression: Expression) -> tuple[np.ndarray, np.ndarray]:
+        """The indices of the referents an expression can express, and its value $v_e$ for each of them."""
+        if expression not in self._expression_values:
+            indices = np.array(
+                [
+                    self._referent_to_index[referent]
+                    for referent in self.universe.referents
+                    if expression.can_express(referent)
+                ],
+                dtype=np.intp,
+            )
+            values = self.utility_matrix[np.ix_(indices, indices)].sum(axis=1) / max(
+                len(indices), 1
+            )
+            self._expression_values[expression] = (indices, values)
+        return self._expression_values[expression]
+
+    def _contributions(
+        self, indices: np.ndarray, counts: np.ndarray, sums: np.ndarray
+    ) -> float:
+        return float(
+            np.sum(
+                self.prior[indices]
+                * np.divide(sums, counts, out=np.zeros(len(indices)), where=counts > 0)
+            )
+        )
+
+    def _change(
+        self,
+        counts: np.ndarray,
+        sums: np.ndarray,
+        informativity: float,
+        expression: Expression,
+        sign: int,
+    ) -> float:
+        """Add (sign 1) or remove (sign -1) an expression in place, returning the new informativity."""
+        indices, values = self._values(expression)
+        before = self._contributions(indices, counts[indices], sums[indices])
+        counts[indices] += sign
+        sums[indices] += sign * values
+        return (
+            informativity
+            - before
+            + self._contributions(indices, counts[indices], sums[indices])
+        )
+
+    def _store(
+        self,
+        language: Language,
+        state: tuple[np.ndarray, np.ndarray, float],
+    ) -> float:
+        self._languages[language] = state
+        if len(self._languages) > self.max_languages:
+            self._languages.popitem(last=False)
+        return state[2]
+
+    def __call__(self, language: Language) -> float:
+        if language in self._languages:
+            self._languages.move_to_end(language)
+            return self._languages[language][2]
+        counts = np.zeros(len(self.universe.referents), dtype=int)
+        sums = np.zeros(len(self.universe.referents))
+        informativity = 0.0
+        for expression in language.expressions:
+            informativity = self._change(counts, sums, informativity, expression, 1)
+        return self._store(language, (counts, sums, informativity))
+
+    def update(self, language: Language, changed: Language) -> float:
+        """The informativity of `changed`, computed from the decomposition of `language` by adding and removing
+        the expressions in which they differ; both decompositions are then cached.
+
+        Args:
+            language: a language, e.g. the parent of a mutation
+
+            changed: a language differing from it by a few expressions, e.g. the mutated language
+
+        Returns:
+            the informativity of `changed`
+        """
+        if changed in self._languages:
+            return self(changed)
+        self(language)
+        counts, sums, informativity = self._languages[language]
+        counts, sums = counts.copy(), sums.copy()
+        for expression in changed.expressions - language.expressions:
+            informativity = self._change(counts, sums, informativity, expression, 1)
+        for expression in language.expressions - changed.expressions:
+            informativity = self._change(counts, sums, informativity, expression, -1)
+        return self._store(changed, (counts, sums, informativity))
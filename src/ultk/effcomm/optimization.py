@@ -2,12 +2,14 @@
 
 from abc import abstractmethod
 import copy
-import random
 import math
 from typing import Any, Callable, Type
+import numpy as np
 from tqdm import tqdm
+from ultk.effcomm.informativity import IncrementalInformativity
 from ultk.effcomm.tradeoff import pareto_optimal_languages
 from ultk.language.language import Expression, Language
+from ultk.util.rng import as_generator, as_python_random
 
 ##############################################################################
 # Mutation
@@ -26,7 +28,10 @@ class Mutation:
     @staticmethod
     @abstractmethod
     def mutate(language: Language, expressions: list[Expression], **kwargs) -> Language:
-        """Mutate the language, possibly using a list of expressions."""
+        """Mutate the language, possibly using a list of expressions.
+
+        The optimizer passes its random number generator as the keyword argument `rng`.
+        """
         raise NotImplementedError()
 
 
@@ -37,8 +42,9 @@ class RemoveExpression(Mutation):
 
     @staticmethod
     def mutate(language: Language, expressions: list[Expression], **kwargs) -> Language:
+        rng = as_generator(kwargs.get("rng"))
         new_expressions = list(language.expressions)
-        new_expressions.pop(random.randrange(len(language)))
+        new_expressions.pop(int(rng.integers(len(language))))
         return type(language)(tuple(sorted(new_expressions)))
 
 
@@ -49,8 +55,9 @@ class AddExpression(Mutation):
 
     @staticmethod
     def mutate(language: Language, expressions: list[Expression], **kwargs) -> Language:
+        rng = as_generator(kwargs.get("rng"))
         new_expressions = list(language.expressions)
-        new_expressions.append(random.choice(expressions))
+        new_expressions.append(expressions[int(rng.integers(len(expressions)))])
         return type(language)(tuple(sorted(new_expressions)))
 
 
@@ -71,6 +78,8 @@ class EvolutionaryOptimizer:
         generations: int,
         lang_size: int | None = None,
         mutations: tuple[Type[Mutation], ...] = (AddExpression, RemoveExpression),
+        rng: np.random.Generator | None = None,
+        incremental_informativity: IncrementalInformativity | None = None,
     ):
         """Initialize the evolutionary algorithm configurations.
 
@@ -95,6 +104,12 @@ class EvolutionaryOptimizer:
             lang_size:    between 1 and this number of expressions comprise a language.
 
             mutations: (optional) a list of Mutation objects, defaults to add/remove expression
+
+            rng: (optional) the random number generator for sampling parents and mutations; by default, one is seeded from the `random` module
+
+            incremental_informativity: (optional) an evaluator which is updated with every mutation, so that objectives using it
+                measure mutated languages incrementally from their parents, e.g.
+                `lambda l: 1 - incremental_informativity(l)`
         """
         self.objectives = objectives
         self.expressions = expressions
@@ -106,6 +121,9 @@ class EvolutionaryOptimizer:
         # set max lang size to # expressions if none provided
         self.lang_size: int = lang_size or len(expressions)
 
+        self.rng = as_generator(rng)
+        self.incremental_informativity = incremental_informativity
+
         self.dominating_languages = None
         self.explored_languages = None
 
@@ -143,7 +161,7 @@ class EvolutionaryOptimizer:
             )
             # Possibly explore
             parent_languages = sample_parents(
-                dominating_languages, explored_languages, explore
+                dominating_languages, explored_languages, explore, self.rng
             )
 
             # Mutate dominating individuals
@@ -183,7 +201,7 @@ class EvolutionaryOptimizer:
 
         for language in languages:
             for _ in range(amount_per_lang):
-                num_mutations = random.randint(1, self.max_mutations)
+                num_mutations = int(self.rng.integers(1, self.max_mutations + 1))
 
                 mutated_language = language
 
@@ -194,7 +212,7 @@ class EvolutionaryOptimizer:
         # Ensure the number of languages per generation is constant
 
         for _ in range(amount_random):
-            language = random.choice(languages)
+            language = languages[int(self.rng.integers(len(languages)))]
             mutated_languages.append(self.mutate(language))
 
         mutated_languages.extend(languages)
@@ -221,14 +239,18 @@ class EvolutionaryOptimizer:
                 language, lang_size=self.lang_size, objectives=self.objectives
             )
         ]
-        mutation = random.choice(possible_mutations)
-        return mutation.mutate(language, self.expressions)
+        mutation = possible_mutations[int(self.rng.integers(len(possible_mutations)))]
+        mutated = mutation.mutate(language, self.expressions, rng=self.rng)
+        if self.incremental_informativity is not None:
+            self.incremental_informativity.update(language, mutated)
+        return mutated
 
 
 def sample_parents(
     dominating_languages: set[Language],
     explored_languages: set[Language],
     explore: float,
+    rng: np.random.Generator | None = None,
 ) -> list[Language]:
     """Use the explore parameter to explore possibly suboptimal areas of the language space.
 
@@ -240,6 +262,8 @@ def sample_parents(
         explore: a float in `[0,1]` specifying how much to explore possibly suboptimal languages.
             If set to 0, `parent_languages` is just `dominating_languages`.
 
+        rng: the random number generator to use; if None, the global one of the `random` module is used.
+
     Returns:
         the languages to serve as the next generation (after possible mutations)
     """
@@ -247,7 +271,8 @@ def sample_parents(
     num_explore = int(explore * total_fit)
     num_fit = total_fit - num_explore
 
-    parent_languages = random.sample(dominating_languages, num_fit)
-    parent_languages.extend(random.sample(explored_languages, num_explore))
+    py_random = as_python_random(rng)
+    parent_languages = py_random.sample(dominating_languages, num_fit)
+    parent_languages.extend(py_random.sample(explored_languages, num_explore))
 
     return list(set(parent_languages))
@@ -0,0 +1,233 @@
+"""A vectorized, log-space engine for the recursive reasoning of the Rational Speech Act framework.
+
+Where `ultk.effcomm.agent` builds one agent object per level of reasoning and language, the functions here compute
+all levels L0, S1, L1, ..., Sn, Ln (or iterate them to a fixed point) for a whole batch of languages at once.
+Languages are given as stacked binary matrices of shape (..., |E|, |M|), e.g. from
+`ultk.effcomm.informativity.stack_meanings`, with an optional mask of shape (..., |E|) marking which rows are
+actual expressions rather than padding.  Speakers are returned as log P(e | m), of shape (..., |M|, |E|), and
+listeners as log P(m | e), of shape (..., |E|, |M|).
+
+With the default temperature and no costs, the first level of reasoning is the same as a `PragmaticSpeaker` of a
+`LiteralListener` and a `PragmaticListener` of that speaker.
+
+Example:
+
+    >>> meanings, language_indices = meaning_matrix(languages)
+    >>> binary, mask = stack_meanings(meanings, language_indices)
+    >>> result = rsa(binary, prior, depth=2, mask=mask)
+    >>> informativities = rsa_informativity(binary, prior, depth=2, mask=mask)
+"""
+
+from typing import Any
+
+import numpy as np
+from scipy.special import logsumexp
+
+
+def _mask(binary: np.ndarray, mask: np.ndarray | None) -> np.ndarray:
+    if mask is None:
+        return np.ones(binary.shape[:-1], dtype=bool)
+    return np.asarray(mask, dtype=bool)
+
+
+def _normalize(log_weights: np.ndarray, axis: int) -> np.ndarray:
+    """Normalize log weights along an axis; where they are all -inf, they stay -inf."""
+    with np.errstate(invalid="ignore"):
+        total = logsumexp(log_weights, axis=axis, keepdims=True)
+        return np.where(np.isneginf(total), -np.inf, log_weights - total)
+
+
+def _log_binary(binary: np.ndarray, mask: np.ndarray | None) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        log_binary = np.log(np.asarray(binary, dtype=float))
+    log_binary[~_mask(binary, mask)] = -np.inf
+    return log_binary
+
+
+def literal_listener(binary: np.ndarray, mask: np.ndarray | None = None) -> np.ndarray:
+    """The literal listener L0, uniform over the referents each expression can express, as a `LiteralListener`.
+
+    Args:
+        binary: stacked binary matrices of shape (..., |E|, |M|)
+
+        mask: which expressions are actual rather than padding, of shape (..., |E|)
+
+    Returns:
+        log P(m | e), of shape (..., |E|, |M|)
+    """
+    return _normalize(_log_binary(binary, mask), axis=-1)
+
+
+def literal_speaker(binary: np.ndarray, mask: np.ndarray | None = None) -> np.ndarray:
+    """The literal speaker S0, uniform over the expressions which can express each referent, as a `LiteralSpeaker`.
+
+    Returns:
+        log P(e | m), of shape (..., |M|, |E|); -inf for referents which no expression can express
+    """
+    return _normalize(np.swapaxes(_log_binary(binary, mask), -1, -2), axis=-1)
+
+
+def pragmatic_speaker(
+    log_listener: np.ndarray,
+    temperature: float | np.ndarray = 1.0,
+    costs: np.ndarray | None = None,
+    mask: np.ndarray | None = None,
+) -> np.ndarray:
+    """A speaker choosing expressions by their utility to a listener, as a `PragmaticSpeaker`:
+
+    $P(e | m) \\propto \\exp(t \\cdot (\\log P_{\\text{Listener}}(m | e) - c(e)))$
+
+    A referent which the listener never guesses gets a uniform distribution over the (actual) expressions.
+
+    Args:
+        log_listener: log P(m | e), of shape (..., |E|, |M|)
+
+        temperature: the rationality t; a scalar, or an array with the shape of the batch, e.g. one per language
+
+        costs: the cost c(e) of each expression, of shape (..., |E|); zero by default
+
+        mask: which expressions are actual rather than padding, of shape (..., |E|)
+
+    Returns:
+        log P(e | m), of shape (..., |M|, |E|)
+    """
+    mask = _mask(log_listener, mask)
+    utility = np.swapaxes(log_listener, -1, -2)
+    if costs is not None:
+        utility = utility - np.asarray(costs)[..., None, :]
+    temperature = np.asarray(temperature, dtype=float)[..., None, None]
+    # (very small probabilities can underflow to -inf at high temperatures)
+    with np.errstate(invalid="ignore", over="ignore"):
+        log_weights = np.where(np.isneginf(utility), -np.inf, temperature * utility)
+    # uniform over the actual expressions for referents no expression reaches
+    unreachable = np.isneginf(log_weights).all(axis=-1, keepdims=True)
+    log_weights = np.where(unreachable, 0.0, log_weights)
+    log_weights = np.where(mask[..., None, :], log_weights, -np.inf)
+    return _normalize(log_weights, axis=-1)
+
+
+def pragmatic_listener(
+    log_speaker: np.ndarray,
+    prior: np.ndarray,
+    log_fallback: np.ndarray | None = None,
+) -> np.ndarray:
+    """A listener guessing the referent a speaker intended, by Bayes' rule, as a `PragmaticListener`:
+
+    $P(m | e) \\propto P_{\\text{Speaker}}(e | m) p(m)$
+
+    Args:
+        log_speaker: log P(e | m), of shape (..., |M|, |E|)
+
+        prior: p(m), of shape (|M|,) or (..., |M|)
+
+        log_fallback: log P(m | e) to use for expressions the speaker never uses, e.g. the literal listener;
+            by default they get -inf everywhere
+
+    Returns:
+        log P(m | e), of shape (..., |E|, |M|)
+    """
+    with np.errstate(divide="ignore"):
+        log_prior = np.log(np.asarray(prior, dtype=float))
+    log_listener = _normalize(
+        np.swapaxes(log_speaker, -1, -2) + log_prior[..., None, :], axis=-1
+    )
+    if log_fallback is not None:
+        unused = np.isneginf(log_listener).all(axis=-1, keepdims=True)
+        log_listener = np.where(unused, log_fallback, log_listener)
+    return log_listener
+
+
+def rsa(
+    binary: np.ndarray,
+    prior: np.ndarray,
+    depth: int | None = 1,
+    temperature: float | np.ndarray = 1.0,
+    costs: np.ndarray | None = None,
+    mask: np.ndarray | None = None,
+    tol: float = 1e-10,
+    max_iterations: int = 1000,
+) -> dict[str, Any]:
+    """Compute the levels of RSA reasoning L0, S1, L1, ..., Sn, Ln for a batch of languages.
+
+    Args:
+        binary: stacked binary matrices of shape (..., |E|, |M|)
+
+        prior: p(m), of shape (|M|,) or (..., |M|)
+
+        depth: the number n of levels of pragmatic reasoning; 0 for literal agents only.
+            If None, reasoning is iterated until no probability of the listeners changes by more than `tol`,
+            or for at most `max_iterations` levels.
+
+        temperature: the rationality of the speakers; a scalar, or an array with the shape of the batch
+
+        costs: the cost of each expression, of shape (..., |E|); zero by default
+
+        mask: which expressions are actual rather than padding, of shape (..., |E|)
+
+        tol: the tolerance for the fixed point, if `depth` is None
+
+        max_iterations: the maximum number of levels, if `depth` is None
+
+    Returns:
+        a dict of the form
+
+            {
+                "speakers": [log S0, log S1, ..., log Sn], each of shape (..., |M|, |E|),
+                "listeners": [log L0, log L1, ..., log Ln], each of shape (..., |E|, |M|),
+                "converged": whether the fixed point was reached (always True if `depth` is given),
+            }
+
+        where S0 is the literal speaker.  Expressions a speaker never uses are interpreted literally by the
+        listener of that level.
+    """
+    if depth is not None and depth < 0:
+        raise ValueError("depth must be non-negative.")
+    mask = _mask(binary, mask)
+    log_literal = literal_listener(binary, mask)
+    speakers = [literal_speaker(binary, mask)]
+    listeners = [log_literal]
+    converged = depth is not None
+    num_levels = depth if depth is not None else max_iterations
+    for _ in range(num_levels):
+        speakers.append(pragmatic_speaker(listeners[-1], temperature, costs, mask))
+        listeners.append(pragmatic_listener(speakers[-1], prior, log_literal))
+        if depth is None:
+            change = np.abs(np.exp(listeners[-1]) - np.exp(listeners[-2]))
+            if np.all(change < tol):
+                converged = True
+                break
+    return {"speakers": speakers, "listeners": listeners, "converged": converged}
+
+
+def rsa_informativity(
+    binary: np.ndarray,
+    prior: np.ndarray,
+    utility_matrix: np.ndarray | None = None,
+    depth: int | None = 1,
+    temperature: float | np.ndarray = 1.0,
+    costs: np.ndarray | None = None,
+    mask: np.ndarray | None = None,
+    **kwargs,
+) -> np.ndarray:
+    """The informativity of a batch of languages for the speaker and listener of the last level of RSA reasoning
+    (see `ultk.effcomm.informativity.communicative_success`).
+
+    Args:
+        binary, prior, depth, temperature, costs, mask: as for `rsa`
+
+        utility_matrix: the matrix of utilities of pairs of referents (see `build_utility_matrix`); defaults to the identity
+
+        **kwargs: further arguments to `rsa`
+
+    Returns:
+        an array with the shape of the batch
+    """
+    result = rsa(binary, prior, depth, temperature, costs, mask, **kwargs)
+    speaker = np.exp(result["speakers"][-1])
+    listener = np.exp(result["listeners"][-1])
+    if utility_matrix is None:
+        utility_matrix = np.eye(np.shape(binary)[-1])
+    # sum_m p(m) sum_e P(e | m) sum_m' P(m' | e) u(m, m')
+    expected_utility = np.einsum("...ek,mk->...em", listener, utility_matrix)
+    prior = np.broadcast_to(prior, speaker.shape[:-1])
+    return np.einsum("...m,...me,...em->...", prior, speaker, expected_utility)
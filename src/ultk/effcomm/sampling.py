@@ -1,22 +1,26 @@
-"""Functions for sampling expressions into languages.
-"""
+"""Functions for sampling expressions into languages."""
 
 import copy
-from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Sequence, Type
 import numpy as np
-from ultk.language.language import Language
+from ultk.language.language import Expression, Language
+from ultk.language.sampling import random_distinct_ranks, upto_comb
 from ultk.effcomm.agent import Speaker, LiteralSpeaker
-from math import comb
+from ultk.util.rng import as_generator, spawn_rngs
+from math import comb, factorial
 from tqdm import tqdm
 
-
 ##############################################################################
 # Methods for generating languages from expressions, or permuting the stochastic mapping from words to meanings of an existing language
 ##############################################################################
 
 
 def get_hypothetical_variants(
-    languages: list[Language] = None, speakers: list[Speaker] = None, total: int = 0
+    languages: list[Language] = None,
+    speakers: list[Speaker] = None,
+    total: int = 0,
+    rng: np.random.Generator | None = None,
 ) -> list[Any]:
     """For each system (parameterized by a language or else a speaker), generate `num` hypothetical variants by permuting the signals that the system assigns to states.
 
@@ -27,6 +31,8 @@ def get_hypothetical_variants(
 
         total: the total number of hypothetical variants to obtain. Should be greater than the number of languages.
 
+        rng: the random number generator used to permute the weights; if None, numpy's global random state is used.
+
     Returns:
         hypothetical_variants: a list of type either Language or np.ndarray depending on whether `languages` or `speakers` was passed, representing hypothetical variants of the systems passed. If `speakers` was passed, a list of speakers is returned.
     """
@@ -50,6 +56,7 @@ def get_hypothetical_variants(
             "Number of languages exceeds the number of languages to be generated. "
         )
 
+    permutation = np.random.permutation if rng is None else rng.permutation
     hypothetical_variants = []
     for i in range(num_systems):
         if languages is not None:
@@ -60,11 +67,12 @@ def get_hypothetical_variants(
         seen = set()
         while len(seen) < variants_per_system:
             # permute columns of speaker weights
-            permuted = np.random.permutation(speaker.weights.T).T
+            permuted = permutation(speaker.weights.T).T
             seen.add(tuple(permuted.flatten()))
 
         for permuted_weights in seen:
-            permuted_speaker = copy.deepcopy(speaker)
+            # the weights are replaced, so the copy can share everything else (e.g. the language)
+            permuted_speaker = copy.copy(speaker)
             permuted_speaker.weights = np.reshape(
                 permuted_weights, (speaker.weights.shape)
             )
@@ -75,3 +83,344 @@ def get_hypothetical_variants(
             hypothetical_variants.append(variant)
 
     return hypothetical_variants
+
+
+def get_hypothetical_variants_parallel(
+    languages: list[Language] = None,
+    speakers: list[Speaker] = None,
+    total: int = 0,
+    seed: int | np.random.SeedSequence | None = None,
+    max_workers: int | None = None,
+) -> list[Any]:
+    """Like `get_hypothetical_variants`, but with the variants of each system generated in parallel processes.
+
+    Each system gets its own random number generator, spawned from `seed` (see `ultk.util.rng.spawn_rngs`),
+    so the result only depends on the seed, not on the number of workers.  The languages or speakers must be picklable.
+
+    Args:
+        languages: as for `get_hypothetical_variants`
+
+        speakers: as for `get_hypothetical_variants`
+
+        total: as for `get_hypothetical_variants`
+
+        seed: the seed of the generators; if None, fresh entropy is used
+
+        max_workers: the maximum number of processes, as for `ProcessPoolExecutor`
+
+    Returns:
+        hypothetical_variants: as for `get_hypothetical_variants`, in the same order of systems.
+    """
+    if (languages is None) == (speakers is None):
+        raise Exception(
+            "You must pass exactly one of the following: `languages`, `speakers`."
+        )
+    systems = languages if languages is not None else speakers
+    variants_per_system = int(total / len(systems))
+    if variants_per_system == 0:
+        raise Exception(
+            "Number of languages exceeds the number of languages to be generated. "
+        )
+
+    rngs = spawn_rngs(seed, len(systems))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                get_hypothetical_variants,
+                languages=[system] if languages is not None else None,
+                speakers=[system] if speakers is not None else None,
+                total=variants_per_system,
+                rng=rng,
+            )
+            for system, rng in zip(systems, rngs)
+        ]
+        return [variant for future in futures for variant in future.result()]
+
+
+##############################################################################
+# Batched hypothetical variants
+##############################################################################
+
+
+def permutation_rank(permutation: Sequence[int]) -> int:
+    """The rank of a permutation of `range(len(permutation))` in lexicographic order, via its Lehmer code."""
+    num_items = len(permutation)
+    rank = 0
+    for pos, item in enumerate(permutation):
+        # the Lehmer digit counts the smaller items still available
+        digit = sum(later < item for later in permutation[pos + 1 :])
+        rank += digit * factorial(num_items - 1 - pos)
+    return rank
+
+
+def permutation_unrank(rank: int, num_items: int) -> tuple[int, ...]:
+    """The permutation of `range(num_items)` with the given rank; the inverse of `permutation_rank`."""
+    return tuple(_permutations_from_ranks([rank], num_items)[0])
+
+
+def _permutations_from_ranks(ranks: Sequence[int], num_items: int) -> np.ndarray:
+    """Decode permutation ranks into a (len(ranks), num_items) array, one permutation per row."""
+    population = factorial(num_items)
+    if any(not 0 <= rank < population for rank in ranks):
+        raise ValueError(f"Rank out of range for permutations of {num_items}.")
+    # Lehmer digits, most significant first
+    if population <= np.iinfo(np.int64).max:
+        remainders = np.array(ranks, dtype=np.int64)
+        digits = np.empty((len(ranks), num_items), dtype=np.int64)
+        for pos in range(num_items):
+            digits[:, pos], remainders = np.divmod(
+                remainders, factorial(num_items - 1 - pos)
+            )
+    else:
+        digits = np.empty((len(ranks), num_items), dtype=np.int64)
+        for row, rank in enumerate(ranks):
+            for pos in range(num_items):
+                digits[row, pos], rank = divmod(rank, factorial(num_items - 1 - pos))
+    # the digit-th item still available, for all permutations at once
+    available = np.ones((len(ranks), num_items), dtype=bool)
+    permutations = np.empty((len(ranks), num_items), dtype=np.intp)
+    for pos in range(num_items):
+        item = np.argmax(np.cumsum(available, axis=1) > digits[:, [pos]], axis=1)
+        permutations[:, pos] = item
+        available[np.arange(len(ranks)), item] = False
+    return permutations
+
+
+def random_permutations(
+    num_items: int, sample_size: int, rng: np.random.Generator | None = None
+) -> np.ndarray:
+    """Sample distinct permutations of `range(num_items)` uniformly at random, by sampling distinct ranks
+    (see `ultk.language.sampling.random_distinct_ranks`) and decoding them in bulk.
+
+    Args:
+        num_items: the number of items to permute
+        sample_size: the number of permutations, at most `num_items!`
+        rng: the random number generator to use; if None, the global random state is used
+
+    Returns:
+        an integer array of shape (sample_size, num_items), one permutation per row
+    """
+    ranks = random_distinct_ranks(factorial(num_items), sample_size, rng)
+    return _permutations_from_ranks(ranks, num_items)
+
+
+class SpeakerVariants(Sequence[Speaker]):
+    """A sequence of hypothetical variants of a speaker, stored as a tensor of weights
+    (see `get_hypothetical_variants_batch`).
+
+    Each variant is only constructed when it is accessed, as a shallow copy of the original speaker
+    with its own weights, which shares the original language.
+    """
+
+    def __init__(self, speaker: Speaker, weights: np.ndarray):
+        self.speaker = speaker
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return SpeakerVariants(self.speaker, self.weights[idx])
+        variant = copy.copy(self.speaker)
+        variant.weights = self.weights[idx]
+        return variant
+
+
+def get_hypothetical_variants_batch(
+    speaker: Speaker,
+    num_variants: int,
+    rng: np.random.Generator | None = None,
+    as_speakers: bool = False,
+) -> np.ndarray | SpeakerVariants:
+    """Generate hypothetical variants of a speaker all at once, by permuting the columns (expressions) of its weights.
+
+    Unlike `get_hypothetical_variants`, which draws permutations until enough distinct weight matrices are found,
+    this draws `num_variants` distinct permutations directly (see `random_permutations`) and applies them with
+    a single indexing operation. If some columns of the weights are equal, distinct permutations can give equal
+    matrices.
+
+    Args:
+        speaker: the speaker whose weights (of shape |M|-by-|E|) to permute
+
+        num_variants: the number of variants, at most |E|!
+
+        rng: the random number generator to use; if None, the global random state is used
+
+        as_speakers: whether to wrap the weights as Speakers (lazily, see `SpeakerVariants`)
+
+    Returns:
+        an array of shape (num_variants, |M|, |E|), whose `idx`-th matrix is the weights of the `idx`-th variant;
+        or with `as_speakers`, the variants as a sequence of Speakers
+    """
+    permutations = random_permutations(speaker.weights.shape[1], num_variants, rng)
+    # (num_variants, |E|, |M|) -> (num_variants, |M|, |E|)
+    weights = speaker.weights.T[permutations].transpose(0, 2, 1)
+    if as_speakers:
+        return SpeakerVariants(speaker, weights)
+    return weights
+
+
+##############################################################################
+# Coverage-driven sampling of the trade-off plane
+##############################################################################
+
+
+def _bin_indices(
+    values: np.ndarray,
+    edges: tuple[tuple[float, float], ...],
+    num_bins: tuple[int, ...],
+) -> np.ndarray:
+    """The bin of each row of `values` along each objective, with values out of range put in the edge bins."""
+    low = np.array([low for low, _ in edges])
+    high = np.array([high for _, high in edges])
+    scaled = (values - low) / (high - low) * np.array(num_bins)
+    return np.clip(np.floor(scaled).astype(int), 0, np.array(num_bins) - 1)
+
+
+def coverage_sample(
+    expressions: Sequence[Expression],
+    objectives: Sequence[Callable[[list[Language]], Sequence[float]]],
+    num_rounds: int,
+    batch_size: int,
+    bins: int | tuple[int, int] = 10,
+    ranges: tuple[tuple[float, float], tuple[float, float]] | None = None,
+    max_size: int | None = None,
+    exploration: float = 0.1,
+    language_class: Type[Language] = Language,
+    rng: np.random.Generator | None = None,
+) -> dict[str, Any]:
+    """Sample languages so as to cover the plane of two objectives (e.g. complexity and communicative cost),
+    rather than concentrating in its dense regions as `ultk.language.sampling.random_languages` does.
+
+    Languages are drawn in rounds: first a size, according to a distribution over sizes, then a uniformly random
+    set of that many expressions.  After each round, the plane is divided into a grid of bins, and each size is
+    scored by how often its languages so far fell into sparsely filled bins (weighting each bin by 1 / (1 + its
+    number of languages)), times the probability that a new draw of that size is a language not seen yet;
+    the distribution over sizes for the next round is proportional to these scores, mixed
+    with a uniform distribution over sizes (by `exploration`) so that every language keeps a positive probability.
+
+    Each draw is recorded with an importance weight p / q, where q is the probability of drawing the language
+    in its round and p its probability under uniform sampling of all languages up to `max_size`, so that summaries
+    of the sample can be corrected for the adaptive allocation.
+
+    Args:
+        expressions: all possible expressions
+
+        objectives: two functions, each measuring a list of languages at once (e.g. complexity and communicative cost)
+
+        num_rounds: the number of rounds
+
+        batch_size: the number of languages drawn in each round
+
+        bins: the number of bins along each objective, or along both
+
+        ranges: the (low, high) range of each objective covered by the bins; by default, that of the first round.
+            Values out of range are put in the outermost bins.
+
+        max_size: the largest possible language; defaults to the number of expressions
+
+        exploration: the weight in [0, 1] of the uniform distribution over sizes in each round
+
+        language_class: type of Language
+
+        rng: the random number generator to use; by default, one is seeded from the `random` module
+
+    Returns:
+        a dict of the form
+
+            {
+                "languages": the distinct languages drawn,
+                "objectives": an array of shape (len(languages), 2) of their values of the objectives,
+                "weights": for each language, the sum of its importance weights over all its draws, divided by the
+                    total number of draws; the weighted sum of any measure of the languages is an unbiased estimate
+                    of its mean under uniform sampling,
+                "bins": an array of shape (len(languages), 2) of the bin of each language,
+                "bin_counts": the number of languages in each bin,
+                "ranges": the ranges covered by the bins,
+                "size_probabilities": a dict of the final probability of drawing each language size,
+            }
+    """
+    if len(objectives) != 2:
+        raise ValueError("Exactly two objectives are needed.")
+    if not 0 <= exploration <= 1:
+        raise ValueError("exploration must be between 0 and 1.")
+    if num_rounds < 1 or batch_size < 1:
+        raise ValueError("At least one round of at least one language is needed.")
+    rng = as_generator(rng)
+    num_expr = len(expressions)
+    if max_size is None:
+        max_size = num_expr
+    num_bins = (bins, bins) if isinstance(bins, int) else tuple(bins)
+    sizes = np.arange(1, max_size + 1)
+    total = upto_comb(num_expr, max_size)
+    # probability of each size under uniform sampling of languages
+    size_shares = np.array([comb(num_expr, size) / total for size in sizes])
+    size_probabilities = np.full(len(sizes), 1 / len(sizes))
+
+    positions: dict[tuple[int, ...], int] = {}
+    languages: list[Language] = []
+    values: list[np.ndarray] = []
+    weights: list[float] = []
+    edges = ranges
+    for _ in range(num_rounds):
+        drawn_sizes = rng.choice(sizes, size=batch_size, p=size_probabilities)
+        new_indices = []
+        for size in drawn_sizes:
+            indices = tuple(sorted(rng.choice(num_expr, size=size, replace=False)))
+            if indices not in positions:
+                positions[indices] = len(weights)
+                weights.append(0.0)
+                new_indices.append(indices)
+            weights[positions[indices]] += (
+                size_shares[size - 1] / size_probabilities[size - 1]
+            )
+
+        new_languages = [
+            language_class(tuple(expressions[idx] for idx in indices))
+            for indices in new_indices
+        ]
+        languages.extend(new_languages)
+        if new_languages:
+            values.append(
+                np.column_stack(
+                    [np.asarray(objective(new_languages)) for objective in objectives]
+                )
+            )
+        all_values = np.concatenate(values)
+        if edges is None:
+            low, high = all_values.min(axis=0), all_values.max(axis=0)
+            edges = tuple((lo, hi if hi > lo else lo + 1) for lo, hi in zip(low, high))
+
+        # reallocate effort towards the sizes which reach sparsely filled bins
+        bin_ids = _bin_indices(all_values, edges, num_bins)
+        flat_bins = np.ravel_multi_index(bin_ids.T, num_bins)
+        bin_counts = np.bincount(flat_bins, minlength=num_bins[0] * num_bins[1])
+        need = 1 / (1 + bin_counts)
+        language_sizes = np.array([len(language) for language in languages])
+        scores = np.bincount(
+            language_sizes - 1, weights=need[flat_bins], minlength=max_size
+        )
+        seen = np.bincount(language_sizes - 1, minlength=max_size)
+        scores = np.divide(scores, seen, out=np.zeros(max_size), where=seen > 0)
+        # discount sizes whose languages have mostly been drawn already
+        scores *= 1 - seen / np.array([comb(num_expr, size) for size in sizes])
+        # be optimistic about sizes not seen yet
+        scores[seen == 0] = scores.max() if scores.max() > 0 else 1.0
+        if not scores.any():
+            # every language has been drawn
+            scores[:] = 1.0
+        size_probabilities = (1 - exploration) * scores / scores.sum() + (
+            exploration / len(sizes)
+        )
+
+    num_draws = num_rounds * batch_size
+    return {
+        "languages": languages,
+        "objectives": all_values,
+        "weights": np.array(weights) / num_draws,
+        "bins": bin_ids,
+        "bin_counts": bin_counts.reshape(num_bins),
+        "ranges": edges,
+        "size_probabilities": dict(zip(sizes.tolist(), size_probabilities)),
+    }
@@ -0,0 +1,265 @@
+"""Simulations of Lewis-Skyrms signaling games, in which senders and receivers learn a language by reinforcement.
+
+In each round of a game, a referent is drawn from the prior, the sender chooses an expression with probability
+proportional to its propensities for that referent, and the receiver guesses a referent with probability
+proportional to its propensities for that expression.  Both then add the reward, the utility of the guess for the
+intended referent, to the propensity of the choice they made (Roth-Erev reinforcement), after discounting all their
+propensities by a forgetting rate.
+
+`roth_erev` runs many independent games at once, with the propensities of all senders and all receivers stacked in
+tensors of shape (games, |M|, |E|) and (games, |E|, |M|), so that each round is a handful of vectorized operations
+over all games.  `signaling_game` runs it for the referents and expressions of a language, and `to_agents` turns
+the result for one game into a `Speaker` and a `Listener`.
+
+Example:
+
+    >>> result = signaling_game(language, num_games=1000, num_rounds=10000, rng=np.random.default_rng(0))
+    >>> result["expected_success"][-1].mean()
+    >>> speaker, listener = to_agents(language, result, game=0)
+"""
+
+from typing import Any, Callable
+
+import numpy as np
+
+from ultk.effcomm.agent import Listener, Speaker
+from ultk.effcomm.informativity import build_utility_matrix, indicator_utility
+from ultk.language.language import Language
+from ultk.language.semantics import Referent
+from ultk.util.rng import as_generator
+
+# propensities are rescaled before the inverse discount of rewards can overflow
+_MAX_SCALE = 1e100
+
+
+def _choose(propensities: np.ndarray, uniform: np.ndarray) -> np.ndarray:
+    """Sample an index from each row of propensities, with probability proportional to them."""
+    cumulative = np.cumsum(propensities, axis=1)
+    choices = (cumulative < uniform[:, None] * cumulative[:, -1:]).sum(axis=1)
+    # guard against rounding in the last cumulative sum
+    return np.minimum(choices, propensities.shape[1] - 1)
+
+
+def _normalize(propensities: np.ndarray) -> np.ndarray:
+    return propensities / propensities.sum(axis=-1, keepdims=True)
+
+
+def expected_success(
+    senders: np.ndarray,
+    receivers: np.ndarray,
+    prior: np.ndarray,
+    utility_matrix: np.ndarray,
+) -> np.ndarray:
+    """The expected reward of each pair of sender and receiver (see `ultk.effcomm.informativity.communicative_success`).
+
+    Args:
+        senders: P(e | m) of each game, of shape (games, |M|, |E|)
+
+        receivers: P(m | e) of each game, of shape (games, |E|, |M|)
+
+        prior: p(m), of shape (|M|,)
+
+        utility_matrix: the utility u(m, m') of guessing m' for m, of shape (|M|, |M|)
+
+    Returns:
+        an array of shape (games,)
+    """
+    # sum_m p(m) sum_e P(e | m) sum_m' P(m' | e) u(m, m')
+    expected_utility = np.einsum("gek,mk->gem", receivers, utility_matrix)
+    return np.einsum("m,gme,gem->g", prior, senders, expected_utility)
+
+
+def roth_erev(
+    num_referents: int,
+    num_expressions: int,
+    num_games: int,
+    num_rounds: int,
+    prior: np.ndarray | None = None,
+    utility_matrix: np.ndarray | None = None,
+    initial: float | np.ndarray = 1.0,
+    forgetting: float = 0.0,
+    record_every: int = 1000,
+    tol: float = 1e-3,
+    rng: np.random.Generator | None = None,
+) -> dict[str, Any]:
+    """Simulate independent signaling games with Roth-Erev reinforcement learning.
+
+    Forgetting multiplies all propensities by (1 - `forgetting`) every round; rather than touching every
+    propensity, rewards are scaled up by the inverse of the accumulated discount instead, which leaves the
+    probabilities of all choices the same.
+
+    Args:
+        num_referents: the number |M| of referents
+
+        num_expressions: the number |E| of expressions
+
+        num_games: the number of independent pairs of sender and receiver
+
+        num_rounds: the number of rounds each pair plays
+
+        prior: the probability p(m) of each referent being drawn; uniform by default
+
+        utility_matrix: the reward u(m, m') for guessing m' when m was intended; the identity by default
+
+        initial: the initial propensities, a scalar or an array broadcastable to the shape of both the senders
+            and the receivers, e.g. of shape (games, 1, 1)
+
+        forgetting: the rate in [0, 1) at which propensities are discounted every round
+
+        record_every: the number of rounds between records of the statistics
+
+        tol: a game has converged when no probability of its sender or receiver changed by more than this
+            between the last two records
+
+        rng: the random number generator; by default a fresh one
+
+    Returns:
+        a dict of the form
+
+            {
+                "senders": P(e | m) of each game after the last round, of shape (games, |M|, |E|),
+                "receivers": P(m | e) of each game after the last round, of shape (games, |E|, |M|),
+                "rounds": the number of rounds played at each record, of shape (records,),
+                "mean_reward": the mean reward of each game since the previous record, of shape (records, games),
+                "expected_success": the expected reward of each game at each record, of shape (records, games),
+                "strategy_change": the largest change of a probability of each game since the previous record,
+                    of shape (records, games),
+                "converged": whether each game has converged, of shape (games,),
+            }
+    """
+    if not 0 <= forgetting < 1:
+        raise ValueError("forgetting must be in [0, 1).")
+    if record_every < 1:
+        raise ValueError("record_every must be positive.")
+    rng = as_generator(rng)
+    if prior is None:
+        prior = np.full(num_referents, 1 / num_referents)
+    prior = np.asarray(prior, dtype=float)
+    if utility_matrix is None:
+        utility_matrix = np.eye(num_referents)
+    utility_matrix = np.asarray(utility_matrix, dtype=float)
+
+    senders = np.empty((num_games, num_referents, num_expressions))
+    receivers = np.empty((num_games, num_expressions, num_referents))
+    senders[...] = initial
+    receivers[...] = initial
+    if np.any(senders.sum(axis=-1) <= 0) or np.any(receivers.sum(axis=-1) <= 0):
+        raise ValueError(
+            "initial propensities must have a positive sum for every choice."
+        )
+
+    cumulative_prior = np.cumsum(prior)
+    games = np.arange(num_games)
+    decay = 1 - forgetting
+    scale = 1.0
+
+    rounds = []
+    mean_reward = []
+    success = []
+    strategy_change = []
+    previous = (_normalize(senders), _normalize(receivers))
+    played = 0
+    while played < num_rounds:
+        block = min(record_every, num_rounds - played)
+        # draw all the randomness of the block at once
+        referents = np.minimum(
+            np.searchsorted(
+                cumulative_prior,
+                rng.random((block, num_games)) * cumulative_prior[-1],
+                side="right",
+            ),
+            num_referents - 1,
+        )
+        uniforms = rng.random((block, 2, num_games))
+        total_reward = np.zeros(num_games)
+        for round_referents, (sender_uniform, receiver_uniform) in zip(
+            referents, uniforms
+        ):
+            expressions = _choose(senders[games, round_referents], sender_uniform)
+            guesses = _choose(receivers[games, expressions], receiver_uniform)
+            rewards = utility_matrix[round_referents, guesses]
+            total_reward += rewards
+            if forgetting:
+                scale /= decay
+            senders[games, round_referents, expressions] += scale * rewards
+            receivers[games, expressions, guesses] += scale * rewards
+            if scale > _MAX_SCALE:
+                senders /= scale
+                receivers /= scale
+                scale = 1.0
+        played += block
+
+        current = (_normalize(senders), _normalize(receivers))
+        rounds.append(played)
+        mean_reward.append(total_reward / block)
+        success.append(expected_success(*current, prior, utility_matrix))
+        strategy_change.append(
+            np.maximum(
+                np.abs(current[0] - previous[0]).max(axis=(1, 2)),
+                np.abs(current[1] - previous[1]).max(axis=(1, 2)),
+            )
+        )
+        previous = current
+
+    strategy_change = np.array(strategy_change).reshape(-1, num_games)
+    return {
+        "senders": previous[0],
+        "receivers": previous[1],
+        "rounds": np.array(rounds, dtype=int),
+        "mean_reward": np.array(mean_reward).reshape(-1, num_games),
+        "expected_success": np.array(success).reshape(-1, num_games),
+        "strategy_change": strategy_change,
+        "converged": (
+            strategy_change[-1] < tol
+            if len(strategy_change)
+            else np.zeros(num_games, dtype=bool)
+        ),
+    }
+
+
+def signaling_game(
+    language: Language,
+    num_games: int,
+    num_rounds: int,
+    prior: np.ndarray | None = None,
+    utility: Callable[[Referent, Referent], float] = indicator_utility,
+    **kwargs,
+) -> dict[str, Any]:
+    """Simulate signaling games over the referents of a language's universe and its expressions, whose meanings are ignored.
+
+    Args:
+        language: the language whose universe and expressions are used; the expressions are indexed as in a
+            `CommunicativeAgent` of the language
+
+        num_games, num_rounds, prior: as for `roth_erev`; the prior defaults to the universe's prior
+
+        utility: the reward of guessing a referent when another was intended
+
+        **kwargs: further arguments to `roth_erev`
+
+    Returns:
+        the result of `roth_erev`
+    """
+    if prior is None:
+        prior = language.universe.prior_numpy
+    return roth_erev(
+        len(language.universe.referents),
+        len(language.expressions),
+        num_games,
+        num_rounds,
+        prior=prior,
+        utility_matrix=build_utility_matrix(language.universe, utility),
+        **kwargs,
+    )
+
+
+def to_agents(
+    language: Language, result: dict[str, Any], game: int = 0
+) -> tuple[Speaker, Listener]:
+    """The sender and receiver of one game of `signaling_game` as communicative agents of the language.
+
+    Their languages can then be read off with `CommunicativeAgent.to_language`.
+    """
+    speaker = Speaker(language, weights=result["senders"][game])
+    listener = Listener(language, weights=result["receivers"][game])
+    return speaker, listener
@@ -5,4 +5,6 @@ At the current stage of development, ULTK focuses on supporting abstractions to
 The `ultk.language.language` submodule contains classes for constructing a language, which can contain one or more expressions. 
 
 The `ultk.language.semantics` submodule contains classes for defining a universe (meaning space) of referents (denotations) and meanings (categories).
+
+The `ultk.language.mcmc` submodule contains a Metropolis-Hastings sampler for inferring grammatical expressions from labeled referents.
 """
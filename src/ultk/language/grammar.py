@@ -1,12 +1,16 @@
 import inspect
+import math
 import random
 import re
 from collections import defaultdict
 from collections.abc import Sequence
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cache
+from heapq import heappop, heappush
 from importlib import import_module
-from itertools import product
-from typing import Any, Callable, Generator, TypedDict, TypeVar
+from itertools import combinations_with_replacement, count, groupby, product
+from types import CodeType
+from typing import Any, Callable, Generator, Iterable, TypedDict, TypeVar
 from yaml import load
 
 try:
@@ -18,10 +22,108 @@ from ultk.language.language import Expression
 from ultk.language.semantics import Meaning, Referent, Universe
 from ultk.util.frozendict import FrozenDict
 
-from learn_quant.set_primitives import FrozensetA, FrozensetB
-
 T = TypeVar("T")
 
+# name -> type, or "module:attribute" import path for types that have not been imported yet
+_type_registry: dict[str, Any] = {}
+
+
+def register_type(typ: Any = None, name: str | None = None) -> Any:
+    """Register a type so that it can be referred to by name in grammar specifications,
+    e.g. in the `func` strings of a YAML grammar.
+
+    The grammar module that defines a type is responsible for registering it, so that
+    `ultk.language.grammar` does not need to import any domain-specific code.  This can be
+    used as a class decorator:
+    ```python
+    @register_type
+    class FrozensetA(frozenset): ...
+    ```
+
+    Alternatively, a type can be registered _lazily_ by its import path, in which case the
+    module containing it will only be imported the first time the type is resolved:
+    ```python
+    register_type("learn_quant.set_primitives:FrozensetA")
+    ```
+
+    Args:
+        typ: the type, or a string of the form "module:attribute"
+        name: the name to register the type under; defaults to the type's (or attribute's) name
+
+    Returns:
+        `typ`, unchanged, so that this function can be used as a decorator
+    """
+    if typ is None:
+        return lambda typ: register_type(typ, name)
+    if name is None:
+        name = typ.rpartition(":")[2] if isinstance(typ, str) else typ.__name__
+    _type_registry[name] = typ
+    return typ
+
+
+def resolve_type(name: str) -> Any:
+    """Look up a type registered with `register_type`, importing it first if it was registered lazily.
+
+    Raises:
+        KeyError: if no type has been registered under `name`
+    """
+    typ = _type_registry[name]
+    if isinstance(typ, str):
+        module_name, _, attribute = typ.partition(":")
+        typ = getattr(import_module(module_name), attribute)
+        _type_registry[name] = typ
+    return typ
+
+
+def _referenced_names(code: CodeType) -> set[str]:
+    """All global names referenced by a code object, including in nested functions."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _referenced_names(const)
+    return names
+
+
+@cache
+def compile_func(source: str) -> Callable:
+    """Evaluate the source code of a function, e.g. a lambda from a YAML grammar.
+
+    The code has access to the globals of this module and to any registered types that it mentions;
+    only those registered types are resolved (and possibly imported).
+
+    Functions are cached by their source, and remember it, so that Rules and GrammaticalExpressions
+    holding them can be pickled by reference to the source and cheaply rebuilt when unpickled
+    (e.g. in the worker processes of a multiprocessing pool).
+    """
+    code = compile(source.strip(), "<grammar>", "eval")
+    namespace = dict(globals())
+    for name in _referenced_names(code):
+        if name in _type_registry and name not in namespace:
+            namespace[name] = resolve_type(name)
+    func = eval(code, namespace)
+    func._source = source
+    return func
+
+
+@dataclass(frozen=True)
+class _FuncSource:
+    """Picklable stand-in for a function created by `compile_func`."""
+
+    source: str
+
+
+def _pickle_func(func: Callable) -> Callable | _FuncSource:
+    source = getattr(func, "_source", None)
+    return func if source is None else _FuncSource(source)
+
+
+def _unpickle_func(func: Callable | _FuncSource) -> Callable:
+    return compile_func(func.source) if isinstance(func, _FuncSource) else func
+
+
+def _return_none(*args) -> None:
+    return None
+
 
 @dataclass(frozen=True)
 class Rule:
@@ -38,13 +140,39 @@ class Rule:
         name: name of the function
         weight: a relative weight to assign to this rule
             when added to a grammar, all rules with the same LHS will be weighted together
+        commutative: whether the order of the arguments is irrelevant, e.g. `and`;
+            enumeration then only builds one ordering of each multiset of children
+        idempotent: whether applying the function to identical arguments returns the argument, e.g. `and(p, p) == p`;
+            enumeration then skips such applications
+        involutive: whether the (unary) function is its own inverse, e.g. `not(not(p)) == p`;
+            enumeration then skips direct applications of this rule to its own output
     """
 
     name: str
     lhs: Any
     rhs: Sequence | None
-    func: Callable = lambda *args: None
+    func: Callable = _return_none
     weight: float = 1.0
+    commutative: bool = False
+    idempotent: bool = False
+    involutive: bool = False
+
+    def __post_init__(self):
+        if self.commutative or self.idempotent:
+            if self.rhs is None or len(self.rhs) < 2 or len(set(self.rhs)) > 1:
+                raise ValueError(
+                    f"Rule {self.name} can only be commutative or idempotent if it has at least two arguments of the same type."
+                )
+        if self.idempotent and self.rhs[0] != self.lhs:
+            raise ValueError(
+                f"Rule {self.name} can only be idempotent if its arguments are of the same type as its output."
+            )
+        if self.involutive and (
+            self.rhs is None or len(self.rhs) != 1 or self.rhs[0] != self.lhs
+        ):
+            raise ValueError(
+                f"Rule {self.name} can only be involutive if it has one argument, of the same type as its output."
+            )
 
     def is_terminal(self) -> bool:
         """Whether this is a terminal rule.  In our framework, this means that RHS is empty,
@@ -52,6 +180,18 @@ class Rule:
         """
         return self.rhs is None
 
+    def __getstate__(self) -> dict:
+        # functions compiled from source (e.g. lambdas in YAML) are pickled by their source
+        state = self.__dict__.copy()
+        state["func"] = _pickle_func(self.func)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state = state.copy()
+        state["func"] = _unpickle_func(state["func"])
+        # bypass frozen __setattr__, as in dataclasses' own unpickling
+        self.__dict__.update(state)
+
     def __str__(self) -> str:
         out_str = f"{str(self.lhs)} -> {self.name}"
         if self.rhs is not None:
@@ -76,6 +216,9 @@ class Rule:
         There are two special kwargs that can be used in the function definition:
         - `weight`: a float, which will be used as the weight of the rule
         - `name`: a string, which will be used as the name of the rule, if you want it to be different than the name of the method
+
+        Similarly, the boolean kwargs `commutative`, `idempotent` and `involutive` set the corresponding
+        attributes of the rule, e.g. `def _and(p1: bool, p2: bool, commutative: bool = True) -> bool`.
         """
         annotations = inspect.signature(func)
         if annotations.return_annotation is inspect.Signature.empty:
@@ -95,6 +238,12 @@ class Rule:
         if "name" in args:
             rule_name = args["name"].default
             del args["name"]
+        # algebraic properties, used to avoid enumerating equivalent expressions
+        properties = {}
+        for prop in ("commutative", "idempotent", "involutive"):
+            if prop in args:
+                properties[prop] = bool(args[prop].default)
+                del args[prop]
         # parameters = {'name': Parameter} ordereddict, so we want the values
         # each value is a Paramter, with .annotation being the actual annotation
         rhs: tuple[Any, ...] | None = tuple(arg.annotation for arg in args.values())
@@ -108,11 +257,13 @@ class Rule:
             rhs=rhs,
             func=func,
             weight=weight,
+            **properties,
         )
 
 
-# We need to use unsafe hash here, because the class needs to be both mutable and hashable (e.g., see https://github.com/CLMBRs/ultk/blob/main/src/ultk/effcomm/agent.py#L30).
-@dataclass(eq=True, kw_only=True, unsafe_hash=True)
+# The class needs to be both mutable and hashable (e.g., see https://github.com/CLMBRs/ultk/blob/main/src/ultk/effcomm/agent.py#L30).
+# It is hashed by its (cached) structure, which is consistent with the generated __eq__ and stable under evaluate().
+@dataclass(eq=True, kw_only=True)
 class GrammaticalExpression(Expression[T]):
     """A GrammaticalExpression has been built up from a Grammar by applying a sequence of Rules.
     Crucially, it is _callable_, using the functions corresponding to each rule.
@@ -120,6 +271,9 @@ class GrammaticalExpression(Expression[T]):
     A GrammaticalExpression, when called, takes in a Referent.  Because of this, a Meaning can
     be generated by specifying a Universe (which contains Referents).
 
+    Structural properties (length, depth, number of atoms, hash and string representations) are computed
+    once, at construction, from the cached properties of the children, so none of them requires a traversal of the tree.
+
     Attributes:
         rule_name: name of the top-most function
         func: the function
@@ -130,10 +284,44 @@ class GrammaticalExpression(Expression[T]):
     func: Callable
     children: tuple | None
     term_expression: str = ""
+    _size: int = field(init=False, repr=False, compare=False)
+    _depth: int = field(init=False, repr=False, compare=False)
+    _num_atoms: int = field(init=False, repr=False, compare=False)
+    _hash: int = field(init=False, repr=False, compare=False)
+    _string: str = field(init=False, repr=False, compare=False)
+    _yield_string: str = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
+        self._update_structure()
         if not self.term_expression:
-            self.term_expression = str(self)
+            self.term_expression = self._string
+
+    def _update_structure(self) -> None:
+        """Compute the structural properties of this node from those of its children."""
+        if self.children is None:
+            self._size, self._depth, self._num_atoms = 1, 0, 1
+            self._string = self._yield_string = self.rule_name
+            self._hash = hash((self.rule_name, None))
+            return
+        children = self.children
+        self._size = 1 + sum(child._size for child in children)
+        self._depth = 1 + max((child._depth for child in children), default=-1)
+        self._num_atoms = sum(child._num_atoms for child in children)
+        self._string = (
+            f"{self.rule_name}({', '.join(child._string for child in children)})"
+        )
+        self._yield_string = "".join(child._yield_string for child in children)
+        self._hash = hash((self.rule_name, tuple(child._hash for child in children)))
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["func"] = _pickle_func(self.func)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state = state.copy()
+        state["func"] = _unpickle_func(state["func"])
+        self.__dict__.update(state)
 
     def yield_string(self) -> str:
         """Get the 'yield' string of this term, i.e. the concatenation
@@ -143,9 +331,7 @@ class GrammaticalExpression(Expression[T]):
         an underlying CFG.  This method will then generate the strings generated by
         the corresponding CFG.
         """
-        if self.children is None:
-            return str(self)
-        return "".join(child.yield_string() for child in self.children)
+        return self._yield_string
 
     def evaluate(self, universe: Universe) -> Meaning:
         # NB: important to use `not self.meaning` and not `self.meaning is None` because of how
@@ -160,10 +346,15 @@ class GrammaticalExpression(Expression[T]):
         return self.meaning
 
     def add_child(self, child) -> None:
+        # keep an automatically generated term_expression in sync with the new structure
+        update_term = self.term_expression == self._string
         if self.children is None:
             self.children = tuple([child])
         else:
             self.children = self.children + (child,)
+        self._update_structure()
+        if update_term:
+            self.term_expression = self._string
 
     def complement(self) -> Meaning:
         """Get the complement of the meaning of this expression, i.e. the set of all referents for which
@@ -191,9 +382,11 @@ class GrammaticalExpression(Expression[T]):
 
     # Following function counts the total number of atoms / leaf nodes, as opposed to __len__, which counts all nodes
     def count_atoms(self):
-        if self.children is None:
-            return 1
-        return sum(child.count_atoms() for child in self.children)
+        return self._num_atoms
+
+    def depth(self) -> int:
+        """The depth of the expression's tree, where atoms have depth 0 (as in `Grammar.enumerate`)."""
+        return self._depth
 
     @classmethod
     def from_dict(cls, the_dict: dict, grammar: "Grammar") -> "GrammaticalExpression":
@@ -214,10 +407,10 @@ class GrammaticalExpression(Expression[T]):
         return self.func(*(child(*args) for child in self.children))
 
     def __len__(self):
-        length = 1
-        if self.children is not None:
-            length += sum(len(child) for child in self.children)
-        return length
+        return self._size
+
+    def __hash__(self):
+        return self._hash
 
     def __lt__(self, other) -> bool:
         if not isinstance(other, GrammaticalExpression):
@@ -232,15 +425,27 @@ class GrammaticalExpression(Expression[T]):
         )
 
     def __str__(self):
-        out_str = self.rule_name
-        if self.children is not None:
-            out_str += f"({', '.join(str(child) for child in self.children)})"
-        return out_str
+        return self._string
 
     def __repr__(self):
         return f"GrammaticalExpression({self.form}, {self.rule_name}, {self.children}, {self.term_expression}, {self.meaning})"
 
 
+@dataclass(frozen=True)
+class InsideScore:
+    """Aggregate scores of all expressions (up to some bound) with the same denotation; see `Grammar.inside`.
+
+    Attributes:
+        probability: total probability of the expressions, under the PCFG defined by the rule weights
+        min_cost: cost of the cheapest expression (by default, its length)
+        expected_length: expected number of nodes of an expression, conditional on its denotation
+    """
+
+    probability: float
+    min_cost: float
+    expected_length: float
+
+
 class UniquenessArgs(TypedDict):
     """Arguments for specifying uniqueness of GrammaticalExpressions in a Grammar.
 
@@ -266,6 +471,13 @@ class Grammar:
         # name -> rule, for fast lookup in parsing
         self._rules_by_name: dict[str, Rule] = {}
         self._start = start
+        # static analysis of the rules, computed lazily and reset whenever a rule is added
+        # nonterminal -> list whose d-th entry says whether an expression of exactly depth d exists
+        self._productive_depths: dict[Any, list[bool]] = {}
+        # nonterminal -> list whose n-th entry says whether an expression of exactly n nodes exists
+        self._productive_sizes: dict[Any, list[bool]] = {}
+        # nonterminal -> number of nodes in the smallest expression it can produce
+        self._min_sizes: dict[Any, float] = {}
 
     def __iter__(self):
         # Return an iterator object
@@ -292,6 +504,156 @@ class Grammar:
                 f"Rules of a grammar must have unique names. This grammar already has a rule named {rule.name}."
             )
         self._rules_by_name[rule.name] = rule
+        # any cached analysis of the grammar is now stale
+        self._productive_depths = {}
+        self._productive_sizes = {}
+        self._min_sizes = {}
+
+    def _nonterminals(self) -> set:
+        """All symbols which occur on either side of a rule."""
+        symbols = set(self._rules)
+        for rule in self.get_all_rules():
+            if rule.rhs is not None:
+                symbols.update(rule.rhs)
+        return symbols
+
+    def _extend_productive_depths(self, depth: int) -> None:
+        """Compute, for every nonterminal, whether it can produce an expression of
+        exactly each depth up to and including `depth`.
+
+        A nonterminal is productive at depth 0 iff it has a terminal rule; it is productive
+        at depth d > 0 iff it has a rule whose children are all productive at some depth below d,
+        and at least one of them at exactly d - 1.
+        """
+        if not self._productive_depths:
+            self._productive_depths = {
+                symbol: [
+                    any(rule.is_terminal() for rule in self._rules.get(symbol, []))
+                ]
+                for symbol in self._nonterminals()
+            }
+        productive = self._productive_depths
+        computed = len(next(iter(productive.values()), [False]))
+        for cur_depth in range(computed, depth + 1):
+            ever = {symbol: any(productive[symbol]) for symbol in productive}
+            at_prev = {symbol: productive[symbol][-1] for symbol in productive}
+            for symbol in productive:
+                productive[symbol].append(
+                    any(
+                        all(ever[child] for child in rule.rhs)
+                        and any(at_prev[child] for child in rule.rhs)
+                        for rule in self._rules.get(symbol, [])
+                        if rule.rhs is not None
+                    )
+                )
+
+    def is_productive(self, lhs: Any, depth: int) -> bool:
+        """Whether `lhs` can produce any expression of exactly the given depth."""
+        self._extend_productive_depths(depth)
+        return lhs in self._productive_depths and self._productive_depths[lhs][depth]
+
+    def _extend_productive_sizes(self, size: int) -> None:
+        """Compute, for every nonterminal, whether it can produce an expression of
+        exactly each size (number of nodes) up to and including `size`.
+        """
+        if not self._productive_sizes:
+            # no expression has zero nodes
+            self._productive_sizes = {
+                symbol: [False] for symbol in self._nonterminals()
+            }
+        productive = self._productive_sizes
+        computed = len(next(iter(productive.values()), [False]))
+        for cur_size in range(computed, size + 1):
+            # _child_sizes only looks at smaller sizes, which have all been computed
+            at_size = {
+                symbol: any(
+                    (
+                        cur_size == 1
+                        if rule.is_terminal()
+                        else next(self._child_sizes(rule, cur_size), None) is not None
+                    )
+                    for rule in self._rules.get(symbol, [])
+                )
+                for symbol in productive
+            }
+            for symbol in productive:
+                productive[symbol].append(at_size[symbol])
+
+    def is_productive_at_size(self, lhs: Any, size: int) -> bool:
+        """Whether `lhs` can produce any expression of exactly `size` nodes."""
+        if size < 1:
+            return False
+        self._extend_productive_sizes(size)
+        return lhs in self._productive_sizes and self._productive_sizes[lhs][size]
+
+    def _child_sizes(self, rule: Rule, size: int) -> Generator[tuple, None, None]:
+        """Generate all tuples of child sizes with which `rule` can produce an expression of
+        exactly `size` nodes, i.e. the splits of `size - 1` nodes among the children for which
+        every child can produce an expression of its size.
+
+        Assumes that productivity has been computed for all sizes below `size`.
+        """
+        if rule.rhs is None:
+            return
+        min_sizes = [self.min_size(child_lhs) for child_lhs in rule.rhs]
+        if float("inf") in min_sizes:
+            return
+        # smallest number of nodes needed by the children after each position
+        min_rest = [int(sum(min_sizes[idx + 1 :])) for idx in range(len(rule.rhs))]
+
+        def split(idx: int, remaining: int) -> Generator[tuple, None, None]:
+            if idx == len(rule.rhs):
+                if remaining == 0:
+                    yield ()
+                return
+            for child_size in range(int(min_sizes[idx]), remaining - min_rest[idx] + 1):
+                if self._productive_sizes[rule.rhs[idx]][child_size]:
+                    for rest in split(idx + 1, remaining - child_size):
+                        yield (child_size,) + rest
+
+        yield from split(0, size - 1)
+
+    def min_size(self, lhs: Any) -> float:
+        """The number of nodes in the smallest expression that `lhs` can produce.
+
+        Returns `float("inf")` if `lhs` cannot produce any (finite) expression.
+        """
+        if not self._min_sizes:
+            sizes = {symbol: float("inf") for symbol in self._nonterminals()}
+            changed = True
+            # Bellman-Ford style relaxation until a fixed point
+            while changed:
+                changed = False
+                for rule in self.get_all_rules():
+                    size = 1 + (
+                        sum(sizes[child] for child in rule.rhs)
+                        if rule.rhs is not None
+                        else 0
+                    )
+                    if size < sizes[rule.lhs]:
+                        sizes[rule.lhs] = size
+                        changed = True
+            self._min_sizes = sizes
+        return self._min_sizes.get(lhs, float("inf"))
+
+    def _child_depths(self, rule: Rule, depth: int) -> Generator[tuple, None, None]:
+        """Generate all tuples of child depths with which `rule` can produce an expression of
+        exactly `depth`, skipping those for which some child has no expression of its depth.
+        """
+        if rule.rhs is None or depth == 0:
+            return
+        self._extend_productive_depths(depth)
+        options = [
+            [
+                child_depth
+                for child_depth in range(depth)
+                if self._productive_depths[child_lhs][child_depth]
+            ]
+            for child_lhs in rule.rhs
+        ]
+        for child_depths in product(*options):
+            if max(child_depths) == depth - 1:
+                yield child_depths
 
     def parse(
         self,
@@ -359,24 +721,91 @@ class Grammar:
             raise ValueError("Could not parse string {expression}")
         return stack[0]
 
-    def generate(self, lhs: Any = None) -> GrammaticalExpression:
-        """Generate an expression from a given lhs."""
+    def _usable_rules(self, lhs: Any, max_depth: int | None) -> list[Rule]:
+        """The rules for `lhs` which can start an expression of depth less than `max_depth` (all rules if None)."""
+        if max_depth is None:
+            return self._rules[lhs]
+        self._extend_productive_depths(max_depth)
+        return [
+            rule
+            for rule in self._rules[lhs]
+            if max_depth > 0
+            and (
+                rule.is_terminal()
+                or all(
+                    any(self._productive_depths[child_lhs][: max_depth - 1])
+                    for child_lhs in rule.rhs
+                )
+            )
+        ]
+
+    def generate(
+        self,
+        lhs: Any = None,
+        max_depth: int | None = None,
+        rng: random.Random | None = None,
+    ) -> GrammaticalExpression:
+        """Generate an expression from a given lhs.
+
+        Each rule is chosen with probability proportional to its weight, among the rules for the current LHS.
+
+        Args:
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+            max_depth: if given, only expressions of depth less than this are generated, by only choosing
+                among the rules which can still complete an expression within the remaining depth
+            rng: the random number generator to use; defaults to the global one of the `random` module
+        """
         if lhs is None:
             lhs = self._start
-        rules = self._rules[lhs]
-        the_rule = random.choices(rules, weights=[rule.weight for rule in rules], k=1)[
-            0
-        ]
+        rules = self._usable_rules(lhs, max_depth)
+        if not rules:
+            raise ValueError(
+                f"{lhs} cannot produce an expression of depth less than {max_depth}."
+            )
+        the_rule = (rng or random).choices(
+            rules, weights=[rule.weight for rule in rules], k=1
+        )[0]
+        child_depth = None if max_depth is None else max_depth - 1
         children = (
             None
             if the_rule.rhs is None
-            else tuple([self.generate(child_lhs) for child_lhs in the_rule.rhs])
+            else tuple(
+                [
+                    self.generate(child_lhs, child_depth, rng)
+                    for child_lhs in the_rule.rhs
+                ]
+            )
         )
         # if the rule is terminal, rhs will be empty, so no recursive calls to generate will be made in this comprehension
         return GrammaticalExpression(
             rule_name=the_rule.name, func=the_rule.func, children=children
         )
 
+    def rule_log_probability(self, rule: Rule, max_depth: int | None = None) -> float:
+        """The log probability with which `generate` chooses `rule` for its LHS, when the expression
+        must have depth less than `max_depth`.  Returns `-inf` if the rule can't be chosen.
+        """
+        rules = self._usable_rules(rule.lhs, max_depth)
+        if not any(other is rule for other in rules):
+            return -math.inf
+        return math.log(rule.weight / sum(other.weight for other in rules))
+
+    def log_probability(
+        self, expression: GrammaticalExpression, max_depth: int | None = None
+    ) -> float:
+        """The log probability that `generate(lhs, max_depth)` produces `expression`, where `lhs` is the LHS of its root rule.
+
+        Without `max_depth`, this is the prior probability of the expression under the PCFG defined by the rule weights.
+        """
+        rule = self._rules_by_name[expression.rule_name]
+        log_prob = self.rule_log_probability(rule, max_depth)
+        child_depth = None if max_depth is None else max_depth - 1
+        for child in expression.children or ():
+            if log_prob == -math.inf:
+                break
+            log_prob += self.log_probability(child, child_depth)
+        return log_prob
+
     def enumerate(
         self,
         depth: int = 8,
@@ -418,29 +847,15 @@ class Grammar:
         if cache is None:
             cache = defaultdict(list)
 
+        # nothing to enumerate if no expression of this depth exists
+        if not self.is_productive(lhs, depth):
+            return
+
         # enumerate from cache if we've seen these args before
         args_tuple = (depth, lhs)
         if args_tuple in cache:
             yield from cache[args_tuple]
         else:
-            do_unique = uniqueness_args is not None
-            if do_unique:
-                unique_dict = uniqueness_args["unique_expressions"]
-                key = uniqueness_args["key"]
-
-                def add_unique(expression: GrammaticalExpression) -> bool:
-                    """Add an expression to the unique_dict, if it is unique and shortest by the compare_func.
-                    Return the outcome boolean."""
-                    expr_key = key(expression)
-                    # if the current expression has not been generated yet
-                    # OR it is "less than" the current entry, add this one
-                    if expr_key not in unique_dict[lhs] or uniqueness_args[
-                        "compare_func"
-                    ](expression, unique_dict[lhs][expr_key]):
-                        unique_dict[lhs][expr_key] = expression
-                        return True
-                    return False
-
             # keep a meaning -> expr dict but also depth -> expr dict
             if depth == 0:
                 for rule in self._rules[lhs]:
@@ -448,39 +863,333 @@ class Grammar:
                         cur_expr: GrammaticalExpression = GrammaticalExpression(
                             rule_name=rule.name, func=rule.func, children=None
                         )
-                        if not do_unique or add_unique(cur_expr):
+                        if self._add_unique(cur_expr, lhs, uniqueness_args):
                             cache[args_tuple].append(cur_expr)
                             yield cur_expr
             else:
                 for rule in self._rules[lhs]:
-                    # can't use terminal rules when depth > 0
-                    if rule.rhs is None:
-                        continue
-
                     # get lists of possible depths for each child
-                    for child_depths in product(range(depth), repeat=len(rule.rhs)):
-                        if max(child_depths) < depth - 1:
-                            continue
+                    # (terminal rules and rules with unproductive children yield none)
+                    for child_depths in self._child_depths(rule, depth):
                         # get all possible children of the relevant depths
-                        # unique by depth?!?!
-                        children_iter = product(
-                            *[
-                                self.enumerate_at_depth(
-                                    child_depth, child_lhs, uniqueness_args, cache
-                                )
-                                for child_depth, child_lhs in zip(
-                                    child_depths, rule.rhs
-                                )
-                            ]
+                        children_iter = self._children(
+                            rule,
+                            child_depths,
+                            lambda child_depth, child_lhs: self.enumerate_at_depth(
+                                child_depth, child_lhs, uniqueness_args, cache
+                            ),
                         )
                         for children in children_iter:
+                            if self._is_redundant(rule, children):
+                                continue
                             cur_expr = GrammaticalExpression(
                                 rule_name=rule.name, func=rule.func, children=children
                             )
-                            if not do_unique or add_unique(cur_expr):
+                            if self._add_unique(cur_expr, lhs, uniqueness_args):
                                 cache[args_tuple].append(cur_expr)
                                 yield cur_expr
 
+    def enumerate_by_size(
+        self,
+        max_size: int,
+        lhs: Any = None,
+        uniqueness_args: UniquenessArgs | None = None,
+    ) -> Generator[GrammaticalExpression, None, None]:
+        """Enumerate all expressions from the grammar with at most `max_size` nodes, from a given LHS,
+        in order of increasing size.
+
+        Unlike `enumerate`, this matches the usual complexity measure (`len`) directly: with `uniqueness_args`
+        and `compare_func` comparing lengths, the expression stored for each key is of minimal length, and once
+        a key has been found no longer expression needs to be considered for it.
+
+        Args:
+            max_size: the largest number of nodes of the expressions
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+            uniqueness_args: see `enumerate`
+
+        Yields:
+            all GrammaticalExpressions with at most `max_size` nodes
+        """
+        if lhs is None:
+            lhs = self._start
+        cache: defaultdict = defaultdict(list)
+        for size in range(1, max_size + 1):
+            yield from self.enumerate_at_size(size, lhs, uniqueness_args, cache)
+
+    def enumerate_at_size(
+        self,
+        size: int,
+        lhs: Any,
+        uniqueness_args: UniquenessArgs | None = None,
+        cache: dict | None = None,
+    ) -> Generator[GrammaticalExpression, None, None]:
+        """Enumerate GrammaticalExpressions for this Grammar with exactly `size` nodes.
+
+        For each rule, the `size - 1` nodes below the root are split among the children in every
+        possible way, and the children of each size are (recursively) enumerated from `cache`.
+        """
+        if cache is None:
+            cache = defaultdict(list)
+
+        if not self.is_productive_at_size(lhs, size):
+            return
+
+        args_tuple = (size, lhs)
+        if args_tuple in cache:
+            yield from cache[args_tuple]
+            return
+        for rule in self._rules[lhs]:
+            if rule.is_terminal():
+                children_iter: Iterable = [None] if size == 1 else []
+            else:
+                children_iter = (
+                    children
+                    for child_sizes in self._child_sizes(rule, size)
+                    for children in self._children(
+                        rule,
+                        child_sizes,
+                        lambda child_size, child_lhs: self.enumerate_at_size(
+                            child_size, child_lhs, uniqueness_args, cache
+                        ),
+                    )
+                )
+            for children in children_iter:
+                if children is not None and self._is_redundant(rule, children):
+                    continue
+                cur_expr = GrammaticalExpression(
+                    rule_name=rule.name, func=rule.func, children=children
+                )
+                if self._add_unique(cur_expr, lhs, uniqueness_args):
+                    cache[args_tuple].append(cur_expr)
+                    yield cur_expr
+
+    @staticmethod
+    def _add_unique(
+        expression: GrammaticalExpression,
+        lhs: Any,
+        uniqueness_args: UniquenessArgs | None,
+    ) -> bool:
+        """Add an expression to the unique_dict, if it is unique and shortest by the compare_func.
+        Return the outcome boolean (always True without `uniqueness_args`)."""
+        if uniqueness_args is None:
+            return True
+        unique_dict = uniqueness_args["unique_expressions"]
+        expr_key = uniqueness_args["key"](expression)
+        # if the current expression has not been generated yet
+        # OR it is "less than" the current entry, add this one
+        if expr_key not in unique_dict[lhs] or uniqueness_args["compare_func"](
+            expression, unique_dict[lhs][expr_key]
+        ):
+            unique_dict[lhs][expr_key] = expression
+            return True
+        return False
+
+    @staticmethod
+    def _children(
+        rule: Rule,
+        child_keys: tuple,
+        enumerate_children: Callable[[Any, Any], Iterable[GrammaticalExpression]],
+    ) -> Iterable[tuple[GrammaticalExpression, ...]]:
+        """All tuples of children for `rule`, where the i-th child is drawn from
+        `enumerate_children(child_keys[i], rule.rhs[i])` (e.g. with the keys being depths or sizes).
+
+        For a commutative rule, only one ordering of each multiset of children is generated:
+        keys must be non-decreasing, and children with equal keys are in enumeration order.
+        """
+        if rule.commutative:
+            if list(child_keys) != sorted(child_keys):
+                return iter(())
+            return (
+                sum(group_children, ())
+                for group_children in product(
+                    *[
+                        combinations_with_replacement(
+                            enumerate_children(child_key, rule.rhs[0]),
+                            len(list(group)),
+                        )
+                        for child_key, group in groupby(child_keys)
+                    ]
+                )
+            )
+        return product(
+            *[
+                enumerate_children(child_key, child_lhs)
+                for child_key, child_lhs in zip(child_keys, rule.rhs)
+            ]
+        )
+
+    @staticmethod
+    def _is_redundant(rule: Rule, children: Sequence[GrammaticalExpression]) -> bool:
+        """Whether applying `rule` to `children` is equivalent to a smaller expression,
+        by the rule's idempotence or involution."""
+        if rule.idempotent and all(
+            str(child) == str(children[0]) for child in children[1:]
+        ):
+            return True
+        return rule.involutive and children[0].rule_name == rule.name
+
+    def _reachable(self, lhs: Any) -> set:
+        """All symbols reachable from `lhs` by (repeatedly) expanding its rules."""
+        reachable = {lhs}
+        frontier = [lhs]
+        while frontier:
+            symbol = frontier.pop()
+            for rule in self._rules.get(symbol, []):
+                for child_lhs in rule.rhs or ():
+                    if child_lhs not in reachable:
+                        reachable.add(child_lhs)
+                        frontier.append(child_lhs)
+        return reachable
+
+    def enumerate_best_first(
+        self,
+        lhs: Any = None,
+        uniqueness_args: UniquenessArgs | None = None,
+        rule_cost: Callable[[Rule], float] | None = None,
+        max_cost: float = float("inf"),
+        depth: int | None = None,
+    ) -> Generator[GrammaticalExpression, None, None]:
+        """Enumerate GrammaticalExpressions from a given LHS in order of non-decreasing cost.
+
+        The cost of an expression is the sum of the costs of the rules used to build it.  By default
+        every rule costs 1, so that the cost of an expression is its length (number of nodes).  For a
+        PCFG-style cost, use e.g. `rule_cost=lambda rule: -math.log(grammar.rule_probability(rule))`.
+
+        Expressions are built bottom-up from a priority queue: each expression popped from the queue is
+        combined with all previously popped expressions to form new candidates.  With `uniqueness_args`,
+        an expression whose key has already been found (for its LHS) is not built upon, so every key is
+        first found by one of its cheapest expressions.  It is therefore safe to stop as soon as all keys
+        of interest have been found, as `get_unique_expressions(..., best_first=True)` does.
+
+        NB: without `uniqueness_args`, `max_cost` or `depth`, this generator is infinite for any recursive grammar.
+
+        Args:
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+            uniqueness_args: see `enumerate`.  Because expressions arrive in order of cost, the first expression
+                for a key is stored, and `compare_func` only decides whether a later one (of equal or greater cost) replaces it.
+            rule_cost: a function giving the non-negative cost of each rule; defaults to 1 for every rule
+            max_cost: only expressions of at most this cost are generated
+            depth: if given, only expressions of depth less than this are generated, as in `enumerate`
+
+        Yields:
+            GrammaticalExpressions with the given LHS, in order of non-decreasing cost
+        """
+        if lhs is None:
+            lhs = self._start
+        symbols = self._reachable(lhs)
+        rules = [rule for symbol in symbols for rule in self._rules.get(symbol, [])]
+        costs = {
+            rule.name: 1.0 if rule_cost is None else rule_cost(rule) for rule in rules
+        }
+        if any(cost < 0 for cost in costs.values()):
+            raise ValueError(
+                "Rule costs must be non-negative for best-first enumeration."
+            )
+        # symbol -> (rule, position) for every occurrence of the symbol on a RHS
+        parents: dict[Any, list[tuple[Rule, int]]] = defaultdict(list)
+        for rule in rules:
+            for position, child_lhs in enumerate(rule.rhs or ()):
+                parents[child_lhs].append((rule, position))
+
+        do_unique = uniqueness_args is not None
+        if do_unique:
+            unique_dict = uniqueness_args["unique_expressions"]
+            key = uniqueness_args["key"]
+            compare_func = uniqueness_args["compare_func"]
+            # shallowest depth at which each (lhs, key) has been built upon
+            # (with a depth limit, a deeper expression can't stand in for a shallower one)
+            used_depths: dict[tuple[Any, Any], int] = {}
+
+        # candidates: (cost, tie-breaker, depth, rule, children); expressions are only built when popped
+        queue: list[tuple[float, int, int, Rule, tuple | None]] = []
+        tie_breaker = count()
+        if depth is None or depth > 0:
+            for rule in rules:
+                if rule.is_terminal() and costs[rule.name] <= max_cost:
+                    heappush(
+                        queue, (costs[rule.name], next(tie_breaker), 0, rule, None)
+                    )
+        # symbol -> popped (cost, depth, expression) triples, in the order they were popped
+        found: dict[Any, list[tuple[float, int, GrammaticalExpression]]] = defaultdict(
+            list
+        )
+
+        while queue:
+            cost, _, expr_depth, rule, children = heappop(queue)
+            cur_expr: GrammaticalExpression = GrammaticalExpression(
+                rule_name=rule.name, func=rule.func, children=children
+            )
+            if do_unique:
+                expr_key = key(cur_expr)
+                is_new = expr_key not in unique_dict[rule.lhs]
+                if is_new or compare_func(cur_expr, unique_dict[rule.lhs][expr_key]):
+                    unique_dict[rule.lhs][expr_key] = cur_expr
+                    if rule.lhs == lhs:
+                        yield cur_expr
+                if not is_new and (
+                    depth is None or used_depths[rule.lhs, expr_key] <= expr_depth
+                ):
+                    continue
+                used_depths[rule.lhs, expr_key] = expr_depth
+            elif rule.lhs == lhs:
+                yield cur_expr
+
+            entry = (cost, expr_depth, cur_expr)
+            found[rule.lhs].append(entry)
+            # every new candidate has this expression as its last-popped child:
+            # at `position`, the first position where it occurs, so each candidate is built only once
+            for parent, position in parents[rule.lhs]:
+                if depth is not None and expr_depth + 1 >= depth:
+                    break
+                if parent.commutative:
+                    # one ordering per multiset of children, in the order they were popped:
+                    # earlier expressions first, then this one in all remaining positions
+                    if position > 0:
+                        continue
+                    arity = len(parent.rhs)
+                    combinations: Iterable[tuple] = (
+                        previous + (entry,) * (arity - num_previous)
+                        for num_previous in range(arity)
+                        for previous in combinations_with_replacement(
+                            found[rule.lhs][:-1], num_previous
+                        )
+                    )
+                else:
+                    options = [
+                        (
+                            [entry]
+                            if idx == position
+                            else (
+                                found[child_lhs][:-1]
+                                if idx < position and child_lhs == rule.lhs
+                                else found[child_lhs]
+                            )
+                        )
+                        for idx, child_lhs in enumerate(parent.rhs)
+                    ]
+                    combinations = product(*options)
+                for combination in combinations:
+                    if self._is_redundant(parent, [child[2] for child in combination]):
+                        continue
+                    new_cost = costs[parent.name] + sum(
+                        child[0] for child in combination
+                    )
+                    new_depth = 1 + max(child[1] for child in combination)
+                    if new_cost > max_cost or (
+                        depth is not None and new_depth >= depth
+                    ):
+                        continue
+                    heappush(
+                        queue,
+                        (
+                            new_cost,
+                            next(tie_breaker),
+                            new_depth,
+                            parent,
+                            tuple(child[2] for child in combination),
+                        ),
+                    )
+
     def get_unique_expressions(
         self,
         depth: int,
@@ -488,6 +1197,9 @@ class Grammar:
         compare_func: Callable[[GrammaticalExpression, GrammaticalExpression], bool],
         lhs: Any = None,
         max_size: float = float("inf"),
+        best_first: bool = False,
+        rule_cost: Callable[[Rule], float] | None = None,
+        size: int | None = None,
     ) -> dict[Any, GrammaticalExpression]:
         """Get all unique GrammaticalExpressions, up to a certain depth, with a user-specified criterion
         of uniqueness, and a specified comparison function for determining which Expression to save when there's a clash.
@@ -498,7 +1210,15 @@ class Grammar:
         This is a wrapper around `enumerate`, but which produces the dictionary of key->Expression entries
         and returns it.  (`enumerate` is a generator with side effects).
 
-        For Args, see the docstring for `enumerate`.
+        For Args, see the docstring for `enumerate`.  In addition:
+            max_size: stop once this many unique keys have been found
+            best_first: use `enumerate_best_first` instead of `enumerate`.  Expressions are then generated in order of
+                cost (by default, length), so the search can stop as soon as `max_size` keys have been found, and the stored
+                expressions are guaranteed to be of minimal cost.  `depth` may be None for no depth limit.
+            rule_cost: the cost of each rule for best-first enumeration (see `enumerate_best_first`)
+            size: if given, use `enumerate_by_size` instead of `enumerate`, i.e. consider all expressions with at most
+                this many nodes (`depth` is then ignored).  As with `best_first`, expressions are generated in order of
+                length, so the search stops once `max_size` keys have been found.
 
         Note: if you additionally want to store _all_ expressions, and not just the unique ones, you should
         directly use `enumerate`.
@@ -516,6 +1236,22 @@ class Grammar:
         }
         if lhs is None:
             lhs = self._start
+        if size is not None:
+            for _ in self.enumerate_by_size(size, lhs, uniqueness_args):
+                if len(unique_dict[lhs]) == max_size:
+                    break
+            return unique_dict[lhs]
+        if best_first:
+            for _ in self.enumerate_best_first(
+                lhs,
+                uniqueness_args=uniqueness_args,
+                rule_cost=rule_cost,
+                depth=depth,
+            ):
+                # later expressions can't be cheaper, so we're done once every key has been found
+                if len(unique_dict[lhs]) == max_size:
+                    break
+            return unique_dict[lhs]
         # run through generator, each iteration will update unique_dict
         for _ in self.enumerate(
             depth,
@@ -527,6 +1263,61 @@ class Grammar:
             pass
         return unique_dict[lhs]
 
+    def get_target_expressions(
+        self,
+        targets: Iterable[Any],
+        unique_key: Callable[[GrammaticalExpression], Any],
+        depth: int | None = None,
+        lhs: Any = None,
+        rule_cost: Callable[[Rule], float] | None = None,
+        max_cost: float = float("inf"),
+    ) -> tuple[dict[Any, GrammaticalExpression], set[Any]]:
+        """Find a minimal expression for each of a set of target keys, e.g. the Meanings that occur in
+        a sample of languages, without enumerating expressions for the whole meaning space.
+
+        This runs `enumerate_best_first` with uniqueness by `unique_key`, so expressions with the same key
+        as a cheaper one are pruned, and stops as soon as every target has been found.
+
+        Args:
+            targets: the keys (e.g. Meanings) to find expressions for
+            unique_key: a function mapping expressions to keys, e.g. `lambda expr: expr.evaluate(universe)`
+            depth: if given, only search expressions of depth less than this
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+            rule_cost: the cost of each rule (see `enumerate_best_first`); by default, expressions are minimal in length
+            max_cost: only search expressions of at most this cost
+
+        Returns:
+            a dictionary mapping each reachable target to a minimal expression for it, and
+            the set of targets for which no expression exists within the `depth` and `max_cost` limits
+        """
+        if lhs is None:
+            lhs = self._start
+        remaining = set(targets)
+        unique_dict: dict[Any, dict[Any, GrammaticalExpression]] = defaultdict(dict)
+        uniqueness_args: UniquenessArgs = {
+            "unique_expressions": unique_dict,
+            "key": unique_key,
+            # expressions arrive in order of cost, so the first one for each key is kept
+            "compare_func": lambda e1, e2: False,
+        }
+        expressions: dict[Any, GrammaticalExpression] = {}
+        if not remaining:
+            return expressions, remaining
+        for expression in self.enumerate_best_first(
+            lhs,
+            uniqueness_args=uniqueness_args,
+            rule_cost=rule_cost,
+            max_cost=max_cost,
+            depth=depth,
+        ):
+            expr_key = unique_key(expression)
+            if expr_key in remaining:
+                expressions[expr_key] = expression
+                remaining.remove(expr_key)
+                if not remaining:
+                    break
+        return expressions, remaining
+
     def get_all_rules(self) -> list[Rule]:
         """Get all rules as a list."""
         rules = []
@@ -534,6 +1325,103 @@ class Grammar:
             rules.extend(self._rules[lhs])
         return rules
 
+    def rule_probability(self, rule: Rule) -> float:
+        """The probability of a rule given its LHS, i.e. its weight normalized by the weights of all rules with the same LHS."""
+        return rule.weight / sum(other.weight for other in self._rules[rule.lhs])
+
+    def inside(
+        self,
+        universe: Universe,
+        depth: int,
+        lhs: Any = None,
+        rule_cost: Callable[[Rule], float] | None = None,
+    ) -> dict[Meaning, InsideScore]:
+        """Score every meaning expressible by the grammar, without enumerating expressions.
+
+        This is the inside algorithm for the PCFG defined by the rule weights (see `rule_probability`), with
+        expressions grouped by their denotation on `universe` rather than by the string they yield.  Bottom-up, for
+        each nonterminal and each denotation, it aggregates the probability mass, the minimum cost, and the
+        (probability-weighted) length of all expressions of depth less than `depth`.  The denotation of an
+        expression is computed pointwise from those of its children, so the work is proportional to the number of
+        distinct denotations rather than of expressions.
+
+        NB: probabilities are truncated at the depth bound, so for a recursive grammar they sum to less than 1.
+        All derivations are counted, as they are by `generate`, regardless of the algebraic properties of the rules.
+
+        Args:
+            universe: the referents on which expressions are evaluated
+            depth: only expressions of depth less than this are considered, as in `enumerate`
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+            rule_cost: a function giving the cost of each rule; defaults to 1 for every rule
+
+        Returns:
+            a dictionary mapping each Meaning expressible by `lhs` to its InsideScore
+        """
+        if lhs is None:
+            lhs = self._start
+        referents = universe.referents
+        rules = [
+            rule
+            for symbol in self._reachable(lhs)
+            for rule in self._rules.get(symbol, [])
+        ]
+        probabilities = {rule.name: self.rule_probability(rule) for rule in rules}
+        costs = {
+            rule.name: 1.0 if rule_cost is None else rule_cost(rule) for rule in rules
+        }
+        # symbol -> denotation -> [probability, probability-weighted length, min cost]
+        # of all expressions of depth less than the current bound
+        table: dict[Any, dict[tuple, list[float]]] = defaultdict(dict)
+        for _ in range(depth):
+            new_table: dict[Any, dict[tuple, list[float]]] = defaultdict(dict)
+            for rule in rules:
+                if rule.is_terminal():
+                    combinations: Iterable[tuple] = [()]
+                else:
+                    combinations = product(
+                        *[table[child_lhs].items() for child_lhs in rule.rhs]
+                    )
+                for combination in combinations:
+                    if rule.is_terminal():
+                        denotation = tuple(
+                            rule.func(referent) for referent in referents
+                        )
+                    else:
+                        denotation = tuple(
+                            rule.func(*values)
+                            for values in zip(*[child[0] for child in combination])
+                        )
+                    child_scores = [child[1] for child in combination]
+                    probability = probabilities[rule.name]
+                    for score in child_scores:
+                        probability *= score[0]
+                    # E[length] of a tree is 1 + the sum of its children's: expand the product rule
+                    length = probability + probabilities[rule.name] * sum(
+                        score[1]
+                        * math.prod(
+                            other[0]
+                            for other_idx, other in enumerate(child_scores)
+                            if other_idx != idx
+                        )
+                        for idx, score in enumerate(child_scores)
+                    )
+                    cost = costs[rule.name] + sum(score[2] for score in child_scores)
+                    entry = new_table[rule.lhs].setdefault(
+                        denotation, [0.0, 0.0, float("inf")]
+                    )
+                    entry[0] += probability
+                    entry[1] += length
+                    entry[2] = min(entry[2], cost)
+            table = new_table
+        return {
+            Meaning(FrozenDict(zip(referents, denotation)), universe): InsideScore(
+                probability=probability,
+                min_cost=cost,
+                expected_length=length / probability if probability > 0 else math.nan,
+            )
+            for denotation, (probability, length, cost) in table[lhs].items()
+        }
+
     def __str__(self):
         return "Rules:\n" + "\n".join(f"\t{rule}" for rule in self.get_all_rules())
 
@@ -560,19 +1448,31 @@ class Grammar:
           func: "lambda p1, p2 : p1 or p2"
         ```
 
+        Rules may also set the boolean attributes `commutative`, `idempotent` and `involutive` (see `Rule`).
+
         Note that for each fule, the value for `func` will be passed to
-        `eval`, so be careful!
+        `eval`, so be careful!  The code may refer to any type registered with `register_type`.
+
+        Types which are defined elsewhere can be registered lazily by an optional top-level `types` key,
+        mapping names to import paths; the modules are only imported if a `func` uses the name:
+
+        ```
+        types:
+          FrozensetA: learn_quant.set_primitives:FrozensetA
+        ```
 
         Arguments:
             filename: file containing a grammar in the above format
         """
         with open(filename, "r") as f:
             grammar_dict = load(f, Loader=Loader)
+        for name, path in grammar_dict.get("types", {}).items():
+            if name not in _type_registry:
+                register_type(path, name)
         grammar = cls(grammar_dict["start"])
         for rule_dict in grammar_dict["rules"]:
             if "func" in rule_dict:
-                # TODO: look-up functions from a registry as well?
-                rule_dict["func"] = eval(rule_dict["func"])
+                rule_dict["func"] = compile_func(rule_dict["func"])
             if "weight" in rule_dict:
                 rule_dict["weight"] = float(rule_dict["weight"])
             grammar.add_rule(Rule(**rule_dict))
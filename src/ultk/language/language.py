@@ -93,9 +93,27 @@ class Language:
         """Count what percentage of expressions in a language have a given property."""
         return sum([property(item) for item in self.expressions]) / len(self)
 
-    def binary_matrix(self) -> np.ndarray:
+    def binary_matrix(self, sparse: bool = False) -> np.ndarray:
         """Get a binary matrix of shape `(num_meanings, num_expressions)`
-        specifying which expressions can express which meanings."""
+        specifying which expressions can express which meanings.
+
+        Args:
+            sparse: whether to return a `scipy.sparse.csr_array`, e.g. for large universes
+        """
+        if sparse:
+            from scipy.sparse import csr_array
+
+            referents = self.universe.referents
+            rows, cols = [], []
+            for col, e in enumerate(self.expressions):
+                for row, m in enumerate(referents):
+                    if e.can_express(m):
+                        rows.append(row)
+                        cols.append(col)
+            return csr_array(
+                (np.ones(len(rows)), (rows, cols)),
+                shape=(len(referents), len(self.expressions)),
+            )
         return np.array(
             [
                 [float(e.can_express(m)) for e in self.expressions]
@@ -0,0 +1,337 @@
+"""Markov chain Monte Carlo inference over the expressions of a `Grammar`.
+
+For grammars too large to enumerate, `SubtreeRegenerationSampler` samples expressions from their posterior
+given labeled referents (e.g. quantifier models labeled with truth values), with the PCFG defined by the rule
+weights as the prior.  Independent chains can be run in parallel processes with `run_chains`.
+"""
+
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Sequence
+
+from ultk.language.grammar import Grammar, GrammaticalExpression, Rule
+from ultk.language.semantics import Referent
+
+
+def _logsumexp(values: Sequence[float]) -> float:
+    top = max(values)
+    if top == -math.inf:
+        return top
+    return top + math.log(sum(math.exp(value - top) for value in values))
+
+
+def _same(expr1: GrammaticalExpression, expr2: GrammaticalExpression) -> bool:
+    return expr1 is expr2 or (hash(expr1) == hash(expr2) and str(expr1) == str(expr2))
+
+
+class SubtreeRegenerationSampler:
+    """Metropolis-Hastings sampler over the expressions of a grammar, conditioned on labeled referents.
+
+    The prior of an expression is its probability under the rule weights (see `Grammar.log_probability`),
+    restricted to expressions of depth less than `max_depth`.  The likelihood assumes that each label is the
+    output of the expression on its referent, except with probability `noise`, in which case it is some other value.
+
+    Each step picks a node of the current expression uniformly at random and regenerates the subtree below it
+    with `Grammar.generate`, within the remaining depth.  The same proposal can be reached by regenerating any
+    node above the deepest node containing all the changes, so the acceptance ratio sums over those nodes, which
+    makes it exact.
+
+    The denotations of the nodes on the referents are cached, keyed by node: a proposal shares all subtrees off
+    the path to the regenerated node with the current expression, so only the new subtree and the path above it
+    are evaluated.
+    """
+
+    def __init__(
+        self,
+        grammar: Grammar,
+        data: Sequence[tuple[Referent, Any]],
+        noise: float = 0.1,
+        max_depth: int = 8,
+        lhs: Any = None,
+    ):
+        """
+        Args:
+            grammar: the grammar generating the expressions
+            data: (referent, label) pairs, where the label is the observed output of the expression on the referent
+            noise: the probability that a label is not the output of the expression
+            max_depth: only expressions of depth less than this are sampled
+            lhs: left hand side to start from; defaults to the grammar's start symbol
+        """
+        if not 0 < noise < 1:
+            raise ValueError("noise must be strictly between 0 and 1.")
+        self.grammar = grammar
+        self.referents = tuple(referent for referent, _ in data)
+        self.labels = tuple(label for _, label in data)
+        self.noise = noise
+        self.max_depth = max_depth
+        self.lhs = lhs
+
+    def _rule(self, node: GrammaticalExpression) -> Rule:
+        return self.grammar._rules_by_name[node.rule_name]
+
+    def log_prior(self, expression: GrammaticalExpression) -> float:
+        return self.grammar.log_probability(expression)
+
+    def log_likelihood(self, expression: GrammaticalExpression) -> float:
+        return self._log_likelihood(
+            tuple(expression(referent) for referent in self.referents)
+        )
+
+    def _log_likelihood(self, values: tuple) -> float:
+        matches = sum(value == label for value, label in zip(values, self.labels))
+        return matches * math.log(1 - self.noise) + (
+            len(self.labels) - matches
+        ) * math.log(self.noise)
+
+    def _denotation(
+        self,
+        node: GrammaticalExpression,
+        cache: dict[int, tuple[GrammaticalExpression, tuple]],
+        new: dict[int, tuple[GrammaticalExpression, tuple]],
+    ) -> tuple:
+        """The outputs of `node` on the referents, from `cache` if possible; newly computed ones are stored in `new`."""
+        for known in (cache, new):
+            entry = known.get(id(node))
+            # the node is stored with its denotation, so that ids can't be reused
+            if entry is not None and entry[0] is node:
+                return entry[1]
+        if node.children is None:
+            values = tuple(node.func(referent) for referent in self.referents)
+        else:
+            values = tuple(
+                node.func(*child_values)
+                for child_values in zip(
+                    *[self._denotation(child, cache, new) for child in node.children]
+                )
+            )
+        new[id(node)] = (node, values)
+        return values
+
+    @staticmethod
+    def _path(expression: GrammaticalExpression, index: int) -> tuple[int, ...]:
+        """The path of child positions to the `index`-th node of `expression`, in pre-order."""
+        path = []
+        node = expression
+        while index > 0:
+            # skip the node itself
+            index -= 1
+            for child_idx, child in enumerate(node.children):
+                if index < len(child):
+                    path.append(child_idx)
+                    node = child
+                    break
+                index -= len(child)
+        return tuple(path)
+
+    @staticmethod
+    def _subtree(
+        expression: GrammaticalExpression, path: Sequence[int]
+    ) -> GrammaticalExpression:
+        for child_idx in path:
+            expression = expression.children[child_idx]
+        return expression
+
+    @staticmethod
+    def _replace(
+        expression: GrammaticalExpression,
+        path: Sequence[int],
+        subtree: GrammaticalExpression,
+    ) -> GrammaticalExpression:
+        """A copy of `expression` with the node at `path` replaced by `subtree`, sharing all other subtrees."""
+        if not path:
+            return subtree
+        children = list(expression.children)
+        children[path[0]] = SubtreeRegenerationSampler._replace(
+            children[path[0]], path[1:], subtree
+        )
+        return GrammaticalExpression(
+            rule_name=expression.rule_name,
+            func=expression.func,
+            children=tuple(children),
+        )
+
+    @staticmethod
+    def _divergence(
+        expr1: GrammaticalExpression, expr2: GrammaticalExpression
+    ) -> tuple[int, ...] | None:
+        """The path to the deepest node containing all differences between the two expressions,
+        or None if they are the same."""
+        if _same(expr1, expr2):
+            return None
+        path = []
+        while expr1.rule_name == expr2.rule_name and expr1.children:
+            differing = [
+                child_idx
+                for child_idx, (child1, child2) in enumerate(
+                    zip(expr1.children, expr2.children)
+                )
+                if not _same(child1, child2)
+            ]
+            if len(differing) != 1:
+                break
+            path.append(differing[0])
+            expr1 = expr1.children[differing[0]]
+            expr2 = expr2.children[differing[0]]
+        return tuple(path)
+
+    def _proposal_log_probability(
+        self,
+        source: GrammaticalExpression,
+        target: GrammaticalExpression,
+        divergence: Sequence[int],
+    ) -> float:
+        """The log probability of proposing `target` from `source`, which differ only below `divergence`:
+        the sum, over the nodes on the path to it, of choosing that node and regenerating its subtree in `target`.
+        """
+        nodes = [target]
+        for child_idx in divergence:
+            nodes.append(nodes[-1].children[child_idx])
+        # log probability of generating each subtree on the path, from the bottom up
+        log_prob = self.grammar.log_probability(
+            nodes[-1], self.max_depth - len(divergence)
+        )
+        log_probs = [log_prob]
+        for depth in reversed(range(len(divergence))):
+            node = nodes[depth]
+            max_depth = self.max_depth - depth
+            log_prob += self.grammar.rule_log_probability(self._rule(node), max_depth)
+            log_prob += sum(
+                self.grammar.log_probability(child, max_depth - 1)
+                for child_idx, child in enumerate(node.children)
+                if child_idx != divergence[depth]
+            )
+            log_probs.append(log_prob)
+        return _logsumexp(log_probs) - math.log(len(source))
+
+    @staticmethod
+    def _forget(
+        expression: GrammaticalExpression,
+        path: Sequence[int],
+        cache: dict[int, tuple[GrammaticalExpression, tuple]],
+    ) -> None:
+        """Remove the nodes on `path` and below it from `cache`, once they have been replaced."""
+        node = expression
+        for child_idx in path:
+            cache.pop(id(node), None)
+            node = node.children[child_idx]
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            cache.pop(id(node), None)
+            stack.extend(node.children or ())
+
+    def run(
+        self,
+        num_steps: int,
+        seed: int | None = None,
+        initial: GrammaticalExpression | None = None,
+        burn_in: int = 0,
+        thin: int = 1,
+    ) -> dict[str, Any]:
+        """Run one chain.
+
+        Args:
+            num_steps: the number of proposals
+            seed: seed of the chain's random number generator
+            initial: the expression to start from, of depth less than `max_depth`; by default one is generated
+            burn_in: the number of initial steps whose expressions are not kept
+            thin: keep only every `thin`-th expression after burn-in
+
+        Returns:
+            a dictionary with keys
+            - `samples`: the kept expressions
+            - `log_posteriors`: their unnormalized log posterior probabilities
+            - `acceptance_rate`: the fraction of accepted proposals
+        """
+        rng = random.Random(seed)
+        grammar = self.grammar
+        current = (
+            initial
+            if initial is not None
+            else grammar.generate(self.lhs, self.max_depth, rng)
+        )
+        cache: dict[int, tuple[GrammaticalExpression, tuple]] = {}
+        log_prior = self.log_prior(current)
+        log_likelihood = self._log_likelihood(self._denotation(current, cache, cache))
+
+        samples = []
+        log_posteriors = []
+        accepted = 0
+        for step in range(num_steps):
+            path = self._path(current, rng.randrange(len(current)))
+            old_subtree = self._subtree(current, path)
+            new_subtree = grammar.generate(
+                self._rule(old_subtree).lhs, self.max_depth - len(path), rng
+            )
+            proposal = self._replace(current, path, new_subtree)
+            divergence = self._divergence(current, proposal)
+            if divergence is None:
+                # proposed the current expression itself
+                accepted += 1
+            else:
+                new: dict[int, tuple[GrammaticalExpression, tuple]] = {}
+                proposal_log_prior = (
+                    log_prior
+                    - grammar.log_probability(old_subtree)
+                    + grammar.log_probability(new_subtree)
+                )
+                proposal_log_likelihood = self._log_likelihood(
+                    self._denotation(proposal, cache, new)
+                )
+                log_acceptance = (
+                    proposal_log_prior
+                    + proposal_log_likelihood
+                    - log_prior
+                    - log_likelihood
+                    + self._proposal_log_probability(proposal, current, divergence)
+                    - self._proposal_log_probability(current, proposal, divergence)
+                )
+                if log_acceptance >= 0 or rng.random() < math.exp(log_acceptance):
+                    self._forget(current, path, cache)
+                    cache.update(new)
+                    current = proposal
+                    log_prior = proposal_log_prior
+                    log_likelihood = proposal_log_likelihood
+                    accepted += 1
+            if step >= burn_in and (step - burn_in) % thin == 0:
+                samples.append(current)
+                log_posteriors.append(log_prior + log_likelihood)
+        return {
+            "samples": samples,
+            "log_posteriors": log_posteriors,
+            "acceptance_rate": accepted / num_steps if num_steps else 0.0,
+        }
+
+
+def run_chains(
+    sampler: SubtreeRegenerationSampler,
+    num_chains: int,
+    num_steps: int,
+    seed: int | None = None,
+    max_workers: int | None = None,
+    **kwargs,
+) -> list[dict[str, Any]]:
+    """Run independent chains of a sampler in parallel processes.
+
+    The sampler, including its grammar and data, must be picklable; see `Grammar` for rules defined in YAML.
+
+    Args:
+        sampler: the sampler to run
+        num_chains: the number of chains
+        num_steps: the number of steps of each chain
+        seed: seed from which the seeds of the chains are drawn
+        max_workers: the maximum number of processes, as for `ProcessPoolExecutor`
+        **kwargs: further arguments to `SubtreeRegenerationSampler.run`, e.g. `burn_in` and `thin`
+
+    Returns:
+        the results of `SubtreeRegenerationSampler.run` for each chain
+    """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for _ in range(num_chains)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(sampler.run, num_steps, seed=chain_seed, **kwargs)
+            for chain_seed in seeds
+        ]
+        return [future.result() for future in futures]
@@ -1,10 +1,13 @@
 import random
-from math import comb
+from math import comb, exp, lgamma, log
 import numpy as np
 from ultk.language.language import Language, Expression
 from ultk.language.semantics import Meaning, Universe
-from typing import Callable, Generator, Iterable, Type, Any
+from ultk.util.frozendict import FrozenDict
+from ultk.util.rng import as_generator, as_python_random, spawn_rngs
+from typing import Callable, Generator, Iterable, Sequence, Type, Any
 from itertools import chain, combinations
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 
@@ -28,11 +31,171 @@ def powerset(iterable: Iterable, max_size: int | None = None) -> Iterable:
     return chain.from_iterable(combinations(s, r) for r in range(1, max_size + 1))
 
 
-def all_meanings(universe: Universe) -> Generator[Meaning, None, None]:
-    """Generate all Meanings (sets of Referents) from a given Universe."""
+def subset_rank(indices: Sequence[int], num_items: int) -> int:
+    """The rank of a non-empty subset of `range(num_items)` in the order of `powerset`:
+    by size, then lexicographically.
+
+    E.g. for `num_items=3`, the subsets in order are (0,) (1,) (2,) (0, 1) (0, 2) (1, 2) (0, 1, 2),
+    so `subset_rank((0, 2), 3) == 4`.
+    """
+    size = len(indices)
+    # lexicographic order is reverse colexicographic order of the mirrored indices
+    lex_rank = (
+        comb(num_items, size)
+        - 1
+        - combination_rank([num_items - 1 - idx for idx in indices])
+    )
+    return upto_comb(num_items, size - 1) + lex_rank
+
+
+def subset_unrank(rank: int, num_items: int) -> tuple[int, ...]:
+    """The non-empty subset of `range(num_items)` with the given rank; the inverse of `subset_rank`.
+
+    Returns:
+        the subset as a sorted tuple of indices
+    """
+    if not 0 <= rank < 2**num_items - 1:
+        raise ValueError(f"Rank {rank} out of range for subsets of {num_items}.")
+    size = 1
+    while rank >= comb(num_items, size):
+        rank -= comb(num_items, size)
+        size += 1
+    mirrored = combination_unrank(comb(num_items, size) - 1 - rank, num_items, size)
+    return tuple(reversed([num_items - 1 - idx for idx in mirrored]))
+
+
+def subsets_in_range(
+    num_items: int, start: int = 0, stop: int | None = None
+) -> Generator[tuple[int, ...], None, None]:
+    """Generate the non-empty subsets of `range(num_items)` with ranks in `range(start, stop)`,
+    in the order of `powerset` (see `subset_rank`), without generating the earlier ones.
+
+    Args:
+        num_items: the number of items
+        start: rank of the first subset
+        stop: rank after the last subset; defaults to the number of non-empty subsets
+    """
+    num_subsets = 2**num_items - 1
+    stop = num_subsets if stop is None else min(stop, num_subsets)
+    if start >= stop:
+        return
+    subset = list(subset_unrank(start, num_items))
+    for _ in range(start, stop):
+        yield tuple(subset)
+        size = len(subset)
+        # lexicographic successor: increment the rightmost index which can be
+        # incremented, and reset the ones after it to follow it
+        pos = size - 1
+        while pos >= 0 and subset[pos] == num_items - size + pos:
+            pos -= 1
+        if pos < 0:
+            # first subset of the next size
+            subset = list(range(size + 1))
+        else:
+            subset[pos] += 1
+            for next_pos in range(pos + 1, size):
+                subset[next_pos] = subset[next_pos - 1] + 1
+
+
+def shard_range(total: int, shard: int, num_shards: int) -> tuple[int, int]:
+    """The `shard`-th of `num_shards` contiguous, (almost) equally-sized blocks of `range(total)`, as (start, stop)."""
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"Shard {shard} out of range for {num_shards} shards.")
+    return total * shard // num_shards, total * (shard + 1) // num_shards
+
+
+def _subsets(
+    num_items: int,
+    max_size: int | None,
+    shard: int | None,
+    num_shards: int,
+    start: int | None,
+    stop: int | None,
+) -> Iterable[tuple[int, ...]]:
+    """The subsets of `range(num_items)` up to `max_size` for `all_meanings` and `all_languages`:
+    all of them by default, or only those of one shard or in a range of ranks."""
+    if max_size is None:
+        max_size = num_items
+    if shard is None and start is None and stop is None:
+        return powerset(range(num_items), max_size)
+    total = upto_comb(num_items, max_size)
+    if shard is not None:
+        start, stop = shard_range(total, shard, num_shards)
+    return subsets_in_range(
+        num_items, start or 0, total if stop is None else min(stop, total)
+    )
+
+
+def all_meanings(
+    universe: Universe,
+    shard: int | None = None,
+    num_shards: int = 1,
+    start: int | None = None,
+    stop: int | None = None,
+) -> Generator[Meaning, None, None]:
+    """Generate all Meanings (sets of Referents) from a given Universe.
+
+    The Meanings can be split among workers, which each only generate their own slice, either by
+    `shard` and `num_shards`, or by a range of ranks (see `subset_rank`) from `start` to `stop`.
+    """
     referents = universe.referents
-    for refset in powerset(referents):
-        yield Meaning(refset, universe)
+    for indices in _subsets(len(referents), None, shard, num_shards, start, stop):
+        yield Meaning(tuple(referents[idx] for idx in indices), universe)
+
+
+def gray_code_meanings(
+    num_referents: int, sizes: Iterable[int] | None = None
+) -> Generator[tuple[int, int], None, None]:
+    """Generate all non-empty meanings (sets of referents) over a universe as integer bitmasks, in Gray-code order,
+    where bit `idx` says whether the `idx`-th referent is in the meaning.
+
+    Consecutive meanings differ in exactly one referent, so measures of meanings can be updated incrementally.
+    With `sizes`, only meanings with those numbers of referents are generated; consecutive meanings then
+    generally differ in more than one referent.
+
+    Args:
+        num_referents: the number of referents in the universe
+        sizes: if given, only generate meanings with these numbers of referents
+
+    Yields:
+        pairs of a meaning and a bitmask of the referents in which it differs from the previous one
+        (from the empty meaning, for the first one); without `sizes`, the latter is `1 << idx`
+        for the one referent `idx` which changed
+    """
+    allowed_sizes = None if sizes is None else set(sizes)
+    previous = 0
+    for idx in range(1, 2**num_referents):
+        bitmask = idx ^ (idx >> 1)
+        if allowed_sizes is None or bin(bitmask).count("1") in allowed_sizes:
+            yield bitmask, bitmask ^ previous
+            previous = bitmask
+
+
+def bitmasks_to_matrix(bitmasks: Iterable[int], num_referents: int) -> np.ndarray:
+    """Convert meanings as integer bitmasks (see `gray_code_meanings`) to a boolean matrix of shape
+    (number of meanings, `num_referents`), whose rows say which referents are in each meaning.
+    """
+    num_bytes = (num_referents + 7) // 8
+    packed = np.frombuffer(
+        b"".join(bitmask.to_bytes(num_bytes, "little") for bitmask in bitmasks),
+        dtype=np.uint8,
+    ).reshape(-1, num_bytes)
+    return np.unpackbits(packed, axis=1, count=num_referents, bitorder="little").astype(
+        bool
+    )
+
+
+def meaning_from_bitmask(bitmask: int, universe: Universe) -> Meaning[bool]:
+    """The Meaning mapping each referent of `universe` to whether it is in the meaning given as a bitmask."""
+    return Meaning(
+        FrozenDict(
+            {
+                referent: bool(bitmask >> idx & 1)
+                for idx, referent in enumerate(universe.referents)
+            }
+        ),
+        universe,
+    )
 
 
 def all_expressions(meanings: Iterable[Meaning]) -> Generator[Expression, None, None]:
@@ -46,19 +209,31 @@ def all_languages(
     expressions: Iterable[Expression],
     language_class: Type[Language] = Language,
     max_size: int | None = None,
+    shard: int | None = None,
+    num_shards: int = 1,
+    start: int | None = None,
+    stop: int | None = None,
 ) -> Generator[Language, None, None]:
     """Generate all Languages (sets of Expressions) from a given set of Expressions.
 
+    The Languages are generated in the order of `powerset`, and can be split among workers, which each
+    jump straight to their own contiguous slice, e.g. `all_languages(expressions, shard=idx, num_shards=8)`.
+
     Args:
         expressions: iterable of all possible expressions
         language_class: the type of language to generate
         max_size: largest size for a language; if None, all subsets of expressions will be used
+        shard: if given, only generate the Languages of this shard (from 0 to `num_shards - 1`)
+        num_shards: the number of shards
+        start: if given, the rank (see `subset_rank`) of the first Language to generate
+        stop: if given, the rank after the last Language to generate
 
     Yields:
         Languages with subsets of Expressions from `expressions`
     """
-    for exprset in powerset(expressions, max_size):
-        yield language_class(tuple(exprset))
+    expressions = list(expressions)
+    for indices in _subsets(len(expressions), max_size, shard, num_shards, start, stop):
+        yield language_class(tuple(expressions[idx] for idx in indices))
 
 
 def upto_comb(num: int, max_k: int) -> int:
@@ -68,12 +243,313 @@ def upto_comb(num: int, max_k: int) -> int:
     return sum(comb(num, k) for k in range(1, max_k + 1))
 
 
+def combination_rank(indices: Sequence[int]) -> int:
+    """The rank of a combination (set of distinct non-negative integers) in colexicographic order,
+    among all combinations of the same size, in the combinatorial number system.
+
+    E.g. the 2-combinations in order are (0, 1), (0, 2), (1, 2), (0, 3), ... so `combination_rank((1, 2)) == 2`.
+    """
+    return sum(comb(idx, pos + 1) for pos, idx in enumerate(sorted(indices)))
+
+
+def _estimate_combination_index(rank: int, pos: int, upper: int) -> int:
+    """Approximately the largest idx in [pos - 1, upper) with comb(idx, pos) <= rank,
+    using comb(idx, pos) ~ (idx - (pos - 1) / 2) ** pos / pos!."""
+    if rank == 0:
+        return pos - 1
+    estimate = exp((log(rank) + lgamma(pos + 1)) / pos) + (pos - 1) / 2
+    return int(min(max(estimate, pos - 1), upper - 1))
+
+
+def combination_unrank(rank: int, num_items: int, size: int) -> tuple[int, ...]:
+    """The combination of `size` out of `num_items` integers with the given colexicographic rank;
+    the inverse of `combination_rank`.
+
+    Returns:
+        the combination as a sorted tuple of indices
+    """
+    if not 0 <= rank < comb(num_items, size):
+        raise ValueError(
+            f"Rank {rank} out of range for combinations of {size} out of {num_items}."
+        )
+    indices = []
+    upper = num_items
+    for pos in range(size, 0, -1):
+        # the largest idx < upper with comb(idx, pos) <= rank:
+        # estimate it in floating point, then correct it exactly
+        idx = _estimate_combination_index(rank, pos, upper)
+        idx_comb = comb(idx, pos)
+        while idx_comb > rank:
+            # comb(idx - 1, pos) = comb(idx, pos) * (idx - pos) / idx
+            idx_comb = idx_comb * (idx - pos) // idx
+            idx -= 1
+        while idx + 1 < upper:
+            # comb(idx + 1, pos) = comb(idx, pos) * (idx + 1) / (idx + 1 - pos), and comb(pos, pos) = 1
+            next_comb = idx_comb * (idx + 1) // (idx + 1 - pos) if idx + 1 > pos else 1
+            if next_comb > rank:
+                break
+            idx, idx_comb = idx + 1, next_comb
+        indices.append(idx)
+        rank -= idx_comb
+        upper = idx
+    return tuple(reversed(indices))
+
+
+def random_distinct_ranks(
+    population: int, sample_size: int, rng: np.random.Generator | None = None
+) -> list[int]:
+    """Sample `sample_size` distinct integers from `range(population)` uniformly at random, without rejection.
+
+    This is Floyd's algorithm, which takes O(sample_size) steps however close `sample_size` is to `population`,
+    and works for arbitrarily large (e.g. combinatorial) populations.
+
+    Args:
+        population: the number of integers to sample from
+        sample_size: the number of integers to sample, at most `population`
+        rng: the random number generator to use; defaults to the global one of the `random` module
+
+    Returns:
+        a list of distinct integers, in random order
+    """
+    if not 0 <= sample_size <= population:
+        raise ValueError(
+            f"Cannot sample {sample_size} distinct integers out of {population}."
+        )
+    # numpy can't draw arbitrarily large integers
+    py_random = as_python_random(rng)
+    ranks: set[int] = set()
+    for upper in range(population - sample_size, population):
+        rank = py_random.randrange(upper + 1)
+        ranks.add(upper if rank in ranks else rank)
+    ranks_list = list(ranks)
+    py_random.shuffle(ranks_list)
+    return ranks_list
+
+
+def _random_distinct(
+    population: int,
+    sample_size: int,
+    draw: Callable[[], Any],
+    unrank: Callable[[int], Any],
+    rng: np.random.Generator | None = None,
+) -> list:
+    """Sample `sample_size` distinct items uniformly at random from a population of the given size,
+    where `draw` draws a uniformly random item and `unrank` gives the item of a given rank.
+
+    If at most half of the population is sampled, duplicates are rejected: each draw is then new with
+    probability at least 1/2, and large ranks never need to be unranked.  Otherwise the population is
+    small, and distinct ranks are sampled without rejection (see `random_distinct_ranks`).
+    """
+    if 2 * sample_size <= population:
+        seen = set()
+        sample = []
+        while len(sample) < sample_size:
+            item = draw()
+            if item not in seen:
+                seen.add(item)
+                sample.append(item)
+        return sample
+    return [
+        unrank(rank) for rank in random_distinct_ranks(population, sample_size, rng)
+    ]
+
+
+def random_combinations(
+    num_items: int,
+    size: int,
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> list[tuple[int, ...]]:
+    """Sample distinct combinations of `size` out of `num_items` indices uniformly at random,
+    in O(sample_size) expected steps however close the sample is to exhaustive.
+
+    Returns:
+        a list of sorted index tuples, in random order
+    """
+    py_random = as_python_random(rng)
+    items = range(num_items)
+
+    def unrank(rank: int) -> tuple[int, ...]:
+        # unrank the smaller of a combination and its complement, which is faster
+        if 2 * size <= num_items:
+            return combination_unrank(rank, num_items, size)
+        excluded = set(combination_unrank(rank, num_items, num_items - size))
+        return tuple(idx for idx in items if idx not in excluded)
+
+    return _random_distinct(
+        comb(num_items, size),
+        sample_size,
+        lambda: tuple(sorted(py_random.sample(items, size))),
+        unrank,
+        rng,
+    )
+
+
+def random_product_combinations(
+    num_natural: int,
+    natural_size: int,
+    num_unnatural: int,
+    unnatural_size: int,
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> list[tuple[tuple[int, ...], tuple[int, ...]]]:
+    """Sample distinct pairs of combinations, of `natural_size` out of `num_natural` indices and of
+    `unnatural_size` out of `num_unnatural` indices, uniformly at random (as in `random_combinations`).
+
+    Returns:
+        a list of pairs of sorted index tuples
+    """
+    py_random = as_python_random(rng)
+    natural_indices = range(num_natural)
+    unnatural_indices = range(num_unnatural)
+    num_unnatural_subsets = comb(num_unnatural, unnatural_size)
+
+    def unrank(rank: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        # ranks in the product of the two combination spaces
+        natural_rank, unnatural_rank = divmod(rank, num_unnatural_subsets)
+        return (
+            combination_unrank(natural_rank, num_natural, natural_size),
+            combination_unrank(unnatural_rank, num_unnatural, unnatural_size),
+        )
+
+    return _random_distinct(
+        comb(num_natural, natural_size) * num_unnatural_subsets,
+        sample_size,
+        lambda: (
+            tuple(sorted(py_random.sample(natural_indices, natural_size))),
+            tuple(sorted(py_random.sample(unnatural_indices, unnatural_size))),
+        ),
+        unrank,
+        rng,
+    )
+
+
+def size_quotas(
+    capacities: dict[Any, int],
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> dict[Any, int]:
+    """Split a sample as evenly as possible among strata (e.g. language sizes) with limited capacities.
+
+    Strata which can't fill their share are exhausted, and the rest of the sample is shared among the others
+    ("water-filling"); a remainder which can't be split evenly goes to randomly chosen strata.
+
+    Args:
+        capacities: the number of available items in each stratum
+        sample_size: the total number of items to sample, at most the sum of the capacities
+        rng: the random number generator to use; defaults to the global one of the `random` module
+
+    Returns:
+        the number of items to sample from each stratum
+    """
+    if sample_size > sum(capacities.values()):
+        raise ValueError(
+            f"Cannot sample {sample_size} items from strata with capacities {capacities}."
+        )
+    py_random = as_python_random(rng)
+    quotas = {stratum: 0 for stratum in capacities}
+    remaining = sample_size
+    while remaining > 0:
+        open_strata = [
+            stratum for stratum in capacities if quotas[stratum] < capacities[stratum]
+        ]
+        share, extra = divmod(remaining, len(open_strata))
+        lucky = set(py_random.sample(open_strata, extra))
+        for stratum in open_strata:
+            added = min(
+                share + (stratum in lucky), capacities[stratum] - quotas[stratum]
+            )
+            quotas[stratum] += added
+            remaining -= added
+    return quotas
+
+
+def random_language_bitmasks(
+    num_expr: int,
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Sample distinct non-empty subsets of `num_expr` expressions uniformly at random, as packed bitmasks.
+
+    Subsets are drawn in batches of random bytes, so that each bit (expression) is included with probability 1/2,
+    and deduplicated by comparing whole rows as bytes; the first occurrence of each subset is kept, in the order drawn.
+
+    Args:
+        num_expr: the number of expressions
+        sample_size: how many subsets to sample; at most the number of non-empty subsets
+        rng: the random number generator to use; by default, one is seeded from the `random` module
+
+    Returns:
+        an array of shape (sample_size, ceil(num_expr / 8)) and dtype uint8, where bit `j % 8` (little-endian)
+        of byte `j // 8` in a row says whether expression `j` is in the subset; see `bitmask_indices`
+    """
+    if num_expr < 64 and sample_size > 2**num_expr - 1:
+        raise ValueError(
+            f"Cannot sample {sample_size} distinct non-empty subsets of {num_expr} expressions."
+        )
+    rng = as_generator(rng)
+    num_bytes = (num_expr + 7) // 8
+    # clear the padding bits of the last byte
+    last_byte_mask = np.uint8((1 << (num_expr % 8)) - 1 if num_expr % 8 else 0xFF)
+    row_type = np.dtype((np.void, num_bytes))
+    bitmasks = np.empty((0, num_bytes), dtype=np.uint8)
+    while len(bitmasks) < sample_size:
+        # draw a few extra rows, to make up for duplicates and empty subsets
+        num_rows = sample_size - len(bitmasks)
+        num_rows += num_rows // 16 + 16
+        batch = np.frombuffer(rng.bytes(num_rows * num_bytes), dtype=np.uint8)
+        batch = batch.reshape(num_rows, num_bytes).copy()
+        batch[:, -1] &= last_byte_mask
+        bitmasks = np.concatenate([bitmasks, batch[batch.any(axis=1)]])
+        _, first_indices = np.unique(bitmasks.view(row_type).ravel(), return_index=True)
+        bitmasks = bitmasks[np.sort(first_indices)]
+    return bitmasks[:sample_size]
+
+
+def bitmask_indices(bitmask: np.ndarray, num_expr: int) -> np.ndarray:
+    """The indices of the expressions in a (packed) bitmask, as returned by `random_language_bitmasks`."""
+    return np.flatnonzero(np.unpackbits(bitmask, count=num_expr, bitorder="little"))
+
+
+class BitmaskLanguages(Sequence[Language]):
+    """A sequence of Languages stored as packed bitmasks over a list of expressions (see `random_language_bitmasks`).
+    Each Language is only constructed when it is accessed.
+    """
+
+    def __init__(
+        self,
+        bitmasks: np.ndarray,
+        expressions: Sequence[Expression],
+        language_class: Type[Language] = Language,
+    ):
+        self.bitmasks = bitmasks
+        self.expressions = expressions
+        self.language_class = language_class
+
+    def __len__(self) -> int:
+        return len(self.bitmasks)
+
+    def indices(self, idx: int) -> np.ndarray:
+        """The indices of the expressions of the `idx`-th language."""
+        return bitmask_indices(self.bitmasks[idx], len(self.expressions))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return BitmaskLanguages(
+                self.bitmasks[idx], self.expressions, self.language_class
+            )
+        return self.language_class(
+            tuple(self.expressions[expr_idx] for expr_idx in self.indices(idx))
+        )
+
+
 def random_languages(
     expressions: Iterable[Expression],
     sampling_strategy: str = "uniform",
     sample_size: int | None = None,
     language_class: Type[Language] = Language,
     max_size: int | None = None,
+    rng: np.random.Generator | None = None,
 ) -> list[Language]:
     """Generate unique Languages by randomly sampling subsets of Expressions, either in a uniform or stratified way.
     If there are fewer than `sample_size` possible Languages up to size `max_size`,
@@ -96,15 +572,19 @@ def random_languages(
         expressions: all possible expressions
         sampling_strategy: how to sample subsets of expressions
             uniform: for every expression, choose whether or not to include it in a given language
+                (languages are sampled in bulk by `random_language_bitmasks`)
             stratified: first sample a size for a Language, then choose that many random Expressions
                 (i) this has the effect of "upsampling" from smaller Language sizes
                 (ii) this can be used with `max_size` to only generate Languages up to a given number of expressions
+                The sample is split evenly among sizes (see `size_quotas`), and the languages of each size
+                are sampled without rejection (see `random_combinations`).
         sample_size: how many languages to return
             if None, will return all languages up to `max_size`
         language_class: type of Language
         max_size: largest possible Language to generate
             if None, will be the length of `expressions`
             NB: this argument has no effect when `sampling_strategy` is "uniform"
+        rng: the random number generator to use; if None, the global random state is used
 
     Returns:
         a list of randomly sampled Languages
@@ -122,22 +602,29 @@ def random_languages(
         return list(
             all_languages(expressions, language_class=language_class, max_size=max_size)
         )
-    languages: list[Language] = []
-    subsets = set()
-    while len(languages) < sample_size:
-        if sampling_strategy == "stratified":
-            lang_size = random.randint(1, max_size)
-            expr_indices = tuple(sorted(random.sample(range(num_expr), lang_size)))
-        elif sampling_strategy == "uniform":
-            expr_indices = tuple(
-                [idx for idx in range(num_expr) if random.choice((True, False))]
-            )
-        if expr_indices not in subsets:
-            subsets.add(expr_indices)
-            languages.append(
-                language_class(tuple(expressions[idx] for idx in expr_indices))
+    if sampling_strategy == "uniform":
+        return list(
+            BitmaskLanguages(
+                random_language_bitmasks(num_expr, sample_size, rng),
+                expressions,
+                language_class,
             )
-    return languages
+        )
+    quotas = size_quotas(
+        {lang_size: comb(num_expr, lang_size) for lang_size in range(1, max_size + 1)},
+        sample_size,
+        rng,
+    )
+    subsets = [
+        expr_indices
+        for lang_size, quota in quotas.items()
+        for expr_indices in random_combinations(num_expr, lang_size, quota, rng)
+    ]
+    as_python_random(rng).shuffle(subsets)
+    return [
+        language_class(tuple(expressions[idx] for idx in expr_indices))
+        for expr_indices in subsets
+    ]
 
 
 def generate_languages(
@@ -151,6 +638,7 @@ def generate_languages(
     id_start: int = 0,
     exact_sample=False,
     verbose=False,
+    rng: np.random.Generator | None = None,
 ) -> dict[str, Any]:
     """Generate languages by randomly sampling vocabularies as bags of expressions.
 
@@ -179,6 +667,8 @@ def generate_languages(
 
         verbose: a boolean representing how verbose output should be during sampling.
 
+        rng: the random number generator to use; if None, the global random state is used.
+
     Returns:
         a dict representing the generated pool of languages and the updated id_start, of the form
 
@@ -251,6 +741,7 @@ def generate_languages(
                 id_start=id_start,
                 dummy_name=dummy_name,
                 verbose=verbose,
+                rng=rng,
             )
 
             rlangs = result["languages"]
@@ -262,8 +753,9 @@ def generate_languages(
         additional_sample = sample_size - len(languages)
         if verbose:
             print(f"Sampled {len(languages)} out of {sample_size} languages.")
+        py_random = as_python_random(rng)
         while additional_sample > 0:
-            word_amount = random.choice(word_amounts)
+            word_amount = py_random.choice(word_amounts)
             if verbose:
                 print(
                     f"Filling remaining languages by sampling {additional_sample} languages of size {word_amount}"
@@ -278,6 +770,7 @@ def generate_languages(
                 id_start,
                 dummy_name=dummy_name,
                 verbose=verbose,
+                rng=rng,
             )["languages"]
             languages = languages.union(rlangs)
             additional_sample = sample_size - len(languages)
@@ -299,6 +792,7 @@ def sample_lang_size(
     id_start: int = 0,
     verbose=False,
     dummy_name="sampled_lang_id",
+    rng: np.random.Generator | None = None,
 ) -> dict[str, Any]:
     """Get a sample of languages each of exactly lang_size.
 
@@ -313,6 +807,8 @@ def sample_lang_size(
 
         id_start: an int representing the number of languages already generated in an experiment.
 
+        rng: the random number generator to use; if None, the global random state is used.
+
     Returns:
         a dict containing the randomly sampled languages and the updated id_start, of the form
 
@@ -330,6 +826,7 @@ def sample_lang_size(
         id_start=id_start,
         dummy_name=dummy_name,
         verbose=verbose,
+        rng=rng,
     )
     return {"languages": list(result["languages"]), "id_start": result["id_start"]}
 
@@ -343,6 +840,7 @@ def sample_quasi_natural(
     id_start: int,
     dummy_name="sampled_lang_id",
     verbose=False,
+    rng: np.random.Generator | None = None,
 ) -> dict[str, Any]:
     """Turn the knob on degree quasi-naturalness for a sample of languages, either by enumerating or randomly sampling unique subsets of all possible combinations.
 
@@ -355,6 +853,8 @@ def sample_quasi_natural(
 
         sample_size: how many languages to sample.
 
+        rng: the random number generator to use; if None, the global random state is used.
+
     Returns:
         a dict containing the randomly sampled quasi-natural languages and the updated id_start, of the form
 
@@ -415,14 +915,18 @@ def sample_quasi_natural(
                     f"Sampling {degree_sample_size} languages of size {lang_size} with degree {num_natural/lang_size}"
                 )
 
-            # Sample unique languages
-            seen: set[Language] = set()
-            for _ in range(degree_sample_size):
+            # Sample unique languages, without rejection if the sample is close to exhaustive
+            for natural_subset, unnatural_subset in random_product_combinations(
+                len(natural_terms),
+                num_natural,
+                len(unnatural_terms),
+                num_unnatural,
+                degree_sample_size,
+                rng,
+            ):
                 vocabulary = tuple(
-                    random_combination_vocabulary(
-                        seen, num_natural, natural_terms, num_unnatural, unnatural_terms
-                    )
-                )
+                    natural_terms[idx] for idx in natural_subset
+                ) + tuple(unnatural_terms[idx] for idx in unnatural_subset)
                 id_start += 1
                 language = language_class(
                     vocabulary, name=rename_id(dummy_name, id_start)
@@ -433,6 +937,146 @@ def sample_quasi_natural(
     return {"languages": languages, "id_start": id_start}
 
 
+def plan_quasi_natural_quotas(
+    num_natural: int,
+    num_unnatural: int,
+    lang_sizes: Iterable[int],
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> dict[tuple[int, int], int]:
+    """Plan exact quotas for sampling languages by size and degree of quasi-naturalness.
+
+    The sample is split evenly among language sizes, and the quota of each size evenly among its degrees
+    (numbers of natural terms), where a stratum which doesn't have enough languages is exhausted and the
+    rest of its share goes to the others (see `size_quotas`).  If there are fewer than `sample_size` languages
+    in total, all of them are planned for.
+
+    Args:
+        num_natural: the number of natural terms
+        num_unnatural: the number of unnatural terms
+        lang_sizes: the sizes of languages to sample
+        sample_size: the total number of languages to sample
+        rng: the random number generator to use; defaults to the global one of the `random` module
+
+    Returns:
+        a dictionary mapping (language size, number of natural terms) to the number of languages to sample
+    """
+    capacities = {
+        lang_size: {
+            num_nat: comb(num_natural, num_nat)
+            * comb(num_unnatural, lang_size - num_nat)
+            for num_nat in range(lang_size + 1)
+        }
+        for lang_size in lang_sizes
+    }
+    size_capacities = {
+        lang_size: sum(degrees.values()) for lang_size, degrees in capacities.items()
+    }
+    sample_size = min(sample_size, sum(size_capacities.values()))
+    quotas = {}
+    for lang_size, size_quota in size_quotas(size_capacities, sample_size, rng).items():
+        for num_nat, quota in size_quotas(
+            capacities[lang_size], size_quota, rng
+        ).items():
+            quotas[lang_size, num_nat] = quota
+    return quotas
+
+
+def stream_quasi_natural(
+    num_natural: int,
+    num_unnatural: int,
+    quotas: dict[tuple[int, int], int],
+    rng: np.random.Generator | None = None,
+) -> Generator[tuple[int, ...], None, None]:
+    """Generate distinct random languages, as tuples of expression indices, following a plan of quotas
+    (see `plan_quasi_natural_quotas`).
+
+    Languages are generated one stratum (size and degree) at a time, so memory is bounded by the
+    largest quota rather than the whole sample.
+
+    Args:
+        num_natural: the number of natural terms
+        num_unnatural: the number of unnatural terms
+        quotas: the number of languages to generate for each (language size, number of natural terms)
+        rng: the random number generator to use; defaults to the global one of the `random` module
+
+    Yields:
+        sorted tuples of indices into the natural terms followed by the unnatural terms,
+        i.e. `natural_terms + unnatural_terms`
+    """
+    for (lang_size, num_nat), quota in quotas.items():
+        for natural_subset, unnatural_subset in random_product_combinations(
+            num_natural, num_nat, num_unnatural, lang_size - num_nat, quota, rng
+        ):
+            yield natural_subset + tuple(num_natural + idx for idx in unnatural_subset)
+
+
+def _sample_stratum(
+    num_natural: int,
+    num_unnatural: int,
+    stratum: tuple[int, int],
+    quota: int,
+    rng: np.random.Generator,
+) -> list[tuple[int, ...]]:
+    return list(stream_quasi_natural(num_natural, num_unnatural, {stratum: quota}, rng))
+
+
+def parallel_quasi_natural(
+    num_natural: int,
+    num_unnatural: int,
+    quotas: dict[tuple[int, int], int],
+    seed: int | np.random.SeedSequence | None = None,
+    max_workers: int | None = None,
+) -> list[tuple[int, ...]]:
+    """Like `stream_quasi_natural`, but with the strata sampled in parallel processes.
+
+    Each stratum gets its own generator, spawned from `seed` (see `ultk.util.rng.spawn_rngs`), so the
+    result only depends on the seed and the quotas, not on the number of workers.
+
+    Args:
+        num_natural: the number of natural terms
+        num_unnatural: the number of unnatural terms
+        quotas: the number of languages to generate for each (language size, number of natural terms)
+        seed: the seed of the generators; if None, fresh entropy is used
+        max_workers: the maximum number of processes, as for `ProcessPoolExecutor`
+
+    Returns:
+        sorted tuples of indices into `natural_terms + unnatural_terms`, stratum by stratum
+    """
+    rngs = spawn_rngs(seed, len(quotas))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _sample_stratum, num_natural, num_unnatural, stratum, quota, rng
+            )
+            for (stratum, quota), rng in zip(quotas.items(), rngs)
+        ]
+        return [indices for future in futures for indices in future.result()]
+
+
+def quasi_natural_languages(
+    language_class: Type[Language],
+    natural_terms: list[Expression],
+    unnatural_terms: list[Expression],
+    lang_sizes: Iterable[int],
+    sample_size: int,
+    rng: np.random.Generator | None = None,
+) -> Generator[Language, None, None]:
+    """Generate distinct random languages with exact quotas per size and degree of quasi-naturalness,
+    constructing each Language only when it is generated.
+
+    See `plan_quasi_natural_quotas` and `stream_quasi_natural`.
+    """
+    expressions = list(natural_terms) + list(unnatural_terms)
+    quotas = plan_quasi_natural_quotas(
+        len(natural_terms), len(unnatural_terms), lang_sizes, sample_size, rng
+    )
+    for indices in stream_quasi_natural(
+        len(natural_terms), len(unnatural_terms), quotas, rng
+    ):
+        yield language_class(tuple(expressions[idx] for idx in indices))
+
+
 ##############################################################################
 # Helper functions for generating languages
 ##############################################################################
@@ -507,6 +1151,7 @@ def random_combination_vocabulary(
     natural_terms: list[Expression],
     num_unnatural: int = 0,
     unnatural_terms: list[Expression] = [],
+    rng: np.random.Generator | None = None,
 ) -> list[Expression]:
     """Get a single vocabulary for a specific language size by choosing a random combination of natural and unnatural terms.
 
@@ -521,26 +1166,29 @@ def random_combination_vocabulary(
 
         unnatural_terms: list[Expression]=[]
 
+        rng: the random number generator to use; if None, the global random state is used.
+
     Returns:
         languages: the extended list of input languages.
     """
+    py_random = as_python_random(rng)
     while True:
         nat_sample_indices = tuple(
-            sorted(random.sample(range(len(natural_terms)), num_natural))
+            sorted(py_random.sample(range(len(natural_terms)), num_natural))
         )
         unnat_sample_indices: tuple[int, ...] = tuple()
         if unnatural_terms:
             unnat_sample_indices = tuple(
-                sorted(random.sample(range(len(unnatural_terms)), num_unnatural))
+                sorted(py_random.sample(range(len(unnatural_terms)), num_unnatural))
             )
         sample_indices = (nat_sample_indices, unnat_sample_indices)
         if sample_indices not in seen:
             # keep track of languages chosen
             seen.add(sample_indices)
+            break
 
-        # Add language
-        vocabulary = [natural_terms[idx] for idx in nat_sample_indices] + [
-            unnatural_terms[idx] for idx in unnat_sample_indices
-        ]
-        break
+    # Add language
+    vocabulary = [natural_terms[idx] for idx in nat_sample_indices] + [
+        unnatural_terms[idx] for idx in unnat_sample_indices
+    ]
     return vocabulary
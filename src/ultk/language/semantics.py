@@ -94,6 +94,14 @@ class Universe:
     def prior_numpy(self) -> np.ndarray:
         return np.array(self.prior)
 
+    @cached_property
+    def _hash(self) -> int:
+        return hash((self.referents, self.prior))
+
+    def __hash__(self) -> int:
+        # hashing every referent is expensive for large universes, and a universe is immutable
+        return self._hash
+
     def __getitem__(self, key: Union[str, int]) -> Referent:
         if type(key) is str:
             return self._referents_by_name[key]
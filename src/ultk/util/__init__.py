@@ -4,4 +4,5 @@ Submodules:
 
 * `frozendict`: An immutable dictionary, so that various mappings (e.g. `Meaning`s) can be hashed, serialized, etc.
 * `io`: some basic input/output functions.
+* `rng`: helpers for explicit, reproducible (and parallel) random number generation.
 """
@@ -11,6 +11,10 @@ class FrozenDict(dict[K, V], Generic[K, V], YAMLObject):
     def __hash__(self):
         return hash(frozenset(self.items()))
 
+    def __reduce__(self):
+        # dict subclasses are otherwise unpickled item by item, via __setitem__
+        return (self.__class__, (dict(self),))
+
     def __setitem__(self, key, value):
         raise TypeError("FrozenDict is immutable")
 
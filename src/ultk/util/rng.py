@@ -0,0 +1,48 @@
+"""Helpers for explicit, reproducible random number generation.
+
+Samplers in ULTK take an optional `rng`, a `numpy.random.Generator`.  If it is None, they fall back on global
+random state (that of the `random` module, unless documented otherwise), so that `random.seed` still makes
+results reproducible.  To run samplers in parallel, give each worker its own generator from `spawn_rngs`:
+the streams are statistically independent, and results depend only on the seed, not on how work is scheduled.
+"""
+
+import random
+from typing import Any
+
+import numpy as np
+
+
+def as_generator(rng: np.random.Generator | None = None) -> np.random.Generator:
+    """`rng` itself, or if None, a new generator seeded from the global state of the `random` module."""
+    if rng is None:
+        return np.random.default_rng(random.getrandbits(64))
+    return rng
+
+
+def as_python_random(rng: np.random.Generator | None = None) -> Any:
+    """A `random.Random` seeded from `rng`, for the standard library's samplers (e.g. of arbitrarily
+    large integers, which numpy does not support); or if None, the global `random` module itself.
+    """
+    if rng is None:
+        return random
+    return random.Random(int(rng.integers(2**63)))
+
+
+def spawn_rngs(
+    seed: int | np.random.SeedSequence | None, num: int
+) -> list[np.random.Generator]:
+    """Independent generators for `num` workers, spawned from a single seed.
+
+    Args:
+        seed: the seed, or a `SeedSequence`; if None, fresh entropy is used
+        num: the number of generators
+
+    Returns:
+        a list of `num` generators with independent streams
+    """
+    seed_sequence = (
+        seed
+        if isinstance(seed, np.random.SeedSequence)
+        else np.random.SeedSequence(seed)
+    )
+    return [np.random.default_rng(child) for child in seed_sequence.spawn(num)]